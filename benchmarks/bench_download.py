@@ -0,0 +1,123 @@
+"""
+Benchmark of large object downloads (pmworker.storage.get_object_to_file):
+single stream GET vs. parallel ranged GETs with different part sizes and
+concurrency.
+
+Run against local S3 compatible service, e.g. minio:
+
+    docker run -p 9000:9000 minio/minio server /data
+    AWS_ACCESS_KEY_ID=minioadmin AWS_SECRET_ACCESS_KEY=minioadmin \\
+        python benchmarks/bench_download.py \\
+        --endpoint-url http://localhost:9000 --size 500
+"""
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+
+MB = 1024 * 1024
+
+
+def configure(endpoint_url, concurrency):
+    """
+    pmworker reads its settings from celery config module; benchmark
+    uses an in memory one.
+    """
+    config = types.ModuleType('bench_config')
+    config.s3_endpoint_url = endpoint_url
+    config.s3_max_pool_connections = max(concurrency)
+    sys.modules['bench_config'] = config
+    os.environ['CELERY_CONFIG_MODULE'] = 'bench_config'
+
+
+def upload_object(s3_client, bucketname, keyname, size):
+    try:
+        s3_client.create_bucket(Bucket=bucketname)
+    except s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    with tempfile.TemporaryFile() as f:
+        for _ in range(size // MB):
+            f.write(os.urandom(MB))
+        f.seek(0)
+        s3_client.upload_fileobj(f, bucketname, keyname)
+
+
+def run(bucketname, keyname, size, part_size, concurrency, repeat):
+    from pmworker.storage import get_object_to_file
+
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        local_abspath = os.path.join(tmp, keyname)
+        for _ in range(repeat):
+            t1 = time.time()
+            get_object_to_file(
+                bucketname,
+                keyname,
+                local_abspath,
+                part_size=part_size,
+                concurrency=concurrency,
+                # threshold above object size means single stream
+                threshold=1 if concurrency > 1 else size + 1
+            )
+            timings.append(time.time() - t1)
+            assert os.path.getsize(local_abspath) == size
+
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--endpoint-url', required=True)
+    parser.add_argument('--bucket', default='pmworker-bench')
+    parser.add_argument('--key', default='docs/bench.pdf')
+    parser.add_argument('--size', type=int, default=256, help="MB")
+    parser.add_argument(
+        '--part-size', type=int, nargs='+', default=[8, 16, 32], help="MB"
+    )
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=[4, 8, 16]
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--keep', action='store_true', help="keep uploaded object"
+    )
+    args = parser.parse_args()
+
+    configure(args.endpoint_url, args.concurrency)
+
+    from pmworker.storage import get_s3_client
+
+    size = args.size * MB
+    s3_client = get_s3_client()
+    upload_object(s3_client, args.bucket, args.key, size)
+
+    print(f"{'part size':>10} {'concurrency':>12} {'time':>8} {'MB/s':>8}")
+    cases = [(args.part_size[0], 1)] + [
+        (part_size, concurrency)
+        for part_size in args.part_size
+        for concurrency in args.concurrency
+    ]
+    try:
+        for part_size, concurrency in cases:
+            elapsed = run(
+                args.bucket,
+                args.key,
+                size,
+                part_size * MB,
+                concurrency,
+                args.repeat
+            )
+            print(
+                f"{part_size:>8}MB {concurrency:>12}"
+                f" {elapsed:>7.2f}s {args.size / elapsed:>8.1f}"
+            )
+    finally:
+        if not args.keep:
+            s3_client.delete_object(Bucket=args.bucket, Key=args.key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of pdftk page specs for very large documents: time to
+compute pages left after delete and the length of resulting pdftk
+command line, one token per page vs. page ranges.
+
+    python benchmarks/bench_page_specs.py --pages 100000 --deleted 1000
+"""
+import time
+import random
+import argparse
+
+from pmworker.pdftk import (
+    cat_ranges_for_delete,
+    get_max_cmd_length,
+    page_ranges,
+    page_spec
+)
+
+
+def cat_ranges_for_delete_list(page_count, page_numbers):
+    # previous implementation: membership test against a list
+    return [
+        number for number in range(1, page_count + 1)
+        if number not in page_numbers
+    ]
+
+
+def timed(func, *args):
+    t1 = time.time()
+    result = func(*args)
+    return result, time.time() - t1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--pages', type=int, default=100000)
+    parser.add_argument('--deleted', type=int, default=1000)
+    args = parser.parse_args()
+
+    deleted = random.sample(range(1, args.pages + 1), args.deleted)
+
+    old, old_time = timed(cat_ranges_for_delete_list, args.pages, deleted)
+    new, new_time = timed(cat_ranges_for_delete, args.pages, deleted)
+    assert old == new
+    print(f"delete {args.deleted} of {args.pages} pages:")
+    print(f"    list membership {old_time:.3f}s")
+    print(f"    set membership  {new_time:.3f}s")
+
+    pages = [('A', page_num) for page_num in new]
+    tokens = [f"{handle}{page_num}" for handle, page_num in pages]
+    specs, specs_time = timed(
+        lambda: [
+            page_spec(handle, first, last, args.pages)
+            for handle, first, last in page_ranges(pages)
+        ]
+    )
+    print("pdftk cat arguments:")
+    print(
+        f"    one token per page {len(tokens)} tokens,"
+        f" {sum(len(token) + 1 for token in tokens)} bytes"
+    )
+    print(
+        f"    page ranges        {len(specs)} tokens,"
+        f" {sum(len(spec) + 1 for spec in specs)} bytes"
+        f" ({specs_time:.3f}s)"
+    )
+    print(f"    command line limit {get_max_cmd_length()} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import logging
+
+from PIL import Image, ImageStat
+
+from pmworker.settings import get_settings
+
+"""
+Blank (and near blank) page detection, performed on the 50% image of
+the page; in thumbnails a single line of text (e.g. page footer) is
+hardly distinguishable from scanning noise.
+"""
+
+logger = logging.getLogger(__name__)
+
+# pixel is considered ink if it is that much darker than background
+INK_DELTA = 48
+# a single line of 24px text (at 100%) has about 0.0004 of ink pixels
+# in 50% image; few dust specks of a scanned blank page about 0.00003
+DEFAULT_MAX_INK_RATIO = 0.0001
+DEFAULT_MAX_STDDEV = 12
+
+
+def page_stats(img_path):
+    """
+    Returns a tuple (ink_ratio, stddev) for given image:
+
+        * ink_ratio - ratio of pixels significantly darker than page
+          background (median brightness)
+        * stddev - standard deviation of brightness
+    """
+    with Image.open(img_path) as image:
+        gray = image.convert('L')
+
+    histogram = gray.histogram()
+    total = sum(histogram)
+
+    cumulative = 0
+    background = 255
+    for level, count in enumerate(histogram):
+        cumulative += count
+        if cumulative * 2 >= total:
+            background = level
+            break
+
+    ink = sum(histogram[:max(0, background - INK_DELTA)])
+    stddev = ImageStat.Stat(gray).stddev[0]
+
+    return ink / total, stddev
+
+
+def is_blank(img_path, max_ink_ratio, max_stddev):
+    ink_ratio, stddev = page_stats(img_path)
+    logger.debug(
+        f"{img_path} ink_ratio={ink_ratio:.4f} stddev={stddev:.2f}"
+    )
+
+    return ink_ratio <= max_ink_ratio and stddev <= max_stddev
+
+
+def is_blank_page(img_path):
+    """
+    Returns True if page image is blank according to settings:
+
+        * blank_page_detection - enables/disables detection (default on)
+        * blank_max_ink_ratio - max ratio of ink pixels
+        * blank_max_stddev - max standard deviation of brightness
+    """
+    settings = get_settings()
+    if not getattr(settings, 'blank_page_detection', True):
+        return False
+
+    return is_blank(
+        img_path,
+        max_ink_ratio=getattr(
+            settings, 'blank_max_ink_ratio', DEFAULT_MAX_INK_RATIO
+        ),
+        max_stddev=getattr(
+            settings, 'blank_max_stddev', DEFAULT_MAX_STDDEV
+        )
+    )
@@ -0,0 +1,140 @@
+import zlib
+import logging
+
+from pmworker.settings import get_settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Compression of text artifacts (txt and hocr files) stored in shared
+storage.
+
+Compressed objects are uploaded with matching Content-Encoding, thus
+HTTP clients (e.g. browser fetching hocr via presigned url) decompress
+them transparently. Worker itself recognizes compressed content by its
+magic bytes, so compressed and plain objects can coexist.
+"""
+
+logger = logging.getLogger(__name__)
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# only these artifacts are compressed
+COMPRESSED_EXTENSIONS = ('.txt', '.hocr')
+
+
+def is_zstd_available():
+    return zstandard is not None
+
+
+def get_encoding():
+    """
+    Returns compression (gzip or zstd) of uploaded txt and hocr files as
+    set in artifact_compression setting; None means no compression.
+    Without zstandard package installed, zstd falls back to gzip.
+    """
+    encoding = getattr(get_settings(), 'artifact_compression', None)
+    if encoding not in (None, GZIP, ZSTD):
+        raise ValueError(f"Unsupported artifact_compression {encoding}")
+
+    if encoding == ZSTD and not is_zstd_available():
+        logger.warning("zstandard is not installed, using gzip instead")
+        return GZIP
+
+    return encoding
+
+
+def compress(data, encoding):
+    if encoding == GZIP:
+        # gzip container with zero mtime - same content, same bytes
+        # (and ETag)
+        compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        return compressor.compress(data) + compressor.flush()
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    return data
+
+
+def sniff(data):
+    """
+    Returns encoding of data (gzip, zstd) or None for plain data.
+    """
+    if data.startswith(GZIP_MAGIC):
+        return GZIP
+    if data.startswith(ZSTD_MAGIC):
+        return ZSTD
+
+    return None
+
+
+def decompress(data):
+    """
+    Decompresses gzip or zstd compressed data; plain data is returned
+    as is.
+    """
+    return b''.join(iter_decompress([data]))
+
+
+def iter_decompress(chunks):
+    """
+    Streaming variant of decompress. Encoding is detected from the first
+    chunk.
+    """
+    chunks = iter(chunks)
+    first = b''
+    # magic bytes may (theoretically) be split between chunks
+    for chunk in chunks:
+        first += chunk
+        if len(first) >= len(ZSTD_MAGIC):
+            break
+
+    encoding = sniff(first)
+    if encoding == GZIP:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == ZSTD:
+        if not is_zstd_available():
+            raise ValueError(
+                "zstd compressed content, but zstandard is not installed"
+            )
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        if first:
+            yield first
+        yield from chunks
+        return
+
+    yield decompressor.decompress(first)
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    if encoding == GZIP:
+        yield decompressor.flush()
+
+
+def decompress_file(path):
+    """
+    Decompresses (in place) gzip or zstd compressed file. Returns True
+    if file was compressed.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if not sniff(data):
+        return False
+
+    with open(path, 'wb') as f:
+        f.write(decompress(data))
+
+    return True
@@ -1,3 +1,5 @@
+from pmworker.routing import get_task_queues, route_task
+
 worker_concurrency = 1
 broker_url = "filesystem://"
 broker_transport_options = {
@@ -7,10 +9,81 @@ broker_transport_options = {
 }
 worker_hijack_root_logger = True
 task_default_exchange = 'papermerge'
+# interactive, bulk and maintenance queues, see pmworker.routing
+task_queues = get_task_queues(task_default_exchange)
+task_routes = (route_task,)
+task_default_queue = 'interactive'
+task_queue_max_priority = 9
+task_default_priority = 3
+# a worker process reserves at most one task ahead, so that long bulk
+# tasks don't hold back interactive ones already in the queue
+worker_prefetch_multiplier = 1
+# tasks are acknowledged when they start (celery's default); late acks
+# would redeliver, i.e. OCR again, tasks running longer than broker's
+# consumer timeout
+# task_acks_late = False
 task_ignore_result = False
 result_expires = 86400
 result_backend = 'rpc://'
 include = 'pmworker.tasks'
 accept_content = ['pickle', 'json']
+# shared storage; scheme selects storage backend:
+# s3:/bucket, local:/mnt/shared/dir or memory:/ (in process, for tests)
 s3_storage = "s3:/..."
 local_storage = "local:/..."
+# max number of pages ocr_document task OCRs in parallel
+# (defaults to number of CPUs)
+ocr_document_concurrency = 2
+# ocr_document renders that many pages per pdftoppm run, next batch
+# while the current one is OCRed (defaults to twice the concurrency)
+ocr_document_render_batch = 4
+# OCR engines (tesserocr) pool: max engines per language and
+# number of pages after which an engine is recycled
+ocr_engine_pool_size = 2
+ocr_engine_max_pages = 200
+# OCR results cache; local tier is enabled by ocr_cache_dir,
+# shared S3 tier by ocr_cache_s3_url (e.g. "s3:/bucket/ocr-cache/")
+ocr_cache_dir = None
+ocr_cache_max_bytes = 1024 * 1024 * 1024
+ocr_cache_s3_url = None
+# pages with embedded text layer of at least text_layer_min_chars
+# characters, text_layer_min_unicode_ratio of them mapped to Unicode,
+# are not OCRed (text_layer_min_chars = None disables this)
+text_layer_min_chars = 100
+text_layer_min_unicode_ratio = 0.9
+# blank pages (detected on 50% image) are not OCRed; a single line
+# of text has more than blank_max_ink_ratio of ink pixels
+blank_page_detection = True
+blank_max_ink_ratio = 0.0001
+blank_max_stddev = 12
+# S3 client (one per worker process) connection pool
+s3_max_pool_connections = 10
+s3_tcp_keepalive = False
+# steps (percents) whose images and hocr files are uploaded;
+# add 10 to upload thumbnails as well
+upload_step_percents = [125, 100, 75, 50]
+# byte budget of local copies of documents and page artifacts;
+# least recently used ones are removed (None - never remove)
+local_cache_max_bytes = 10 * 1024 * 1024 * 1024
+# seconds between two evictions (of the same worker process)
+local_cache_evict_interval = 60
+# objects of at least s3_download_threshold bytes are downloaded with
+# s3_download_concurrency parallel ranged GETs of s3_download_part_size
+s3_download_part_size = 8 * 1024 * 1024
+s3_download_threshold = 64 * 1024 * 1024
+s3_download_concurrency = 10
+# compression of uploaded txt and hocr files: None, 'gzip' or 'zstd'
+# (zstd requires zstandard package)
+artifact_compression = None
+# gc_document_versions task keeps that many latest document versions
+gc_keep_versions = 2
+# engine of page operations (reorder, delete, paste): 'pikepdf' (in
+# process, used by default when pikepdf is installed) or 'pdftk'
+pdf_engine = 'pikepdf'
+# ocr_document_split task: estimated OCR time of an average page (in
+# seconds), target run time of one chunk, min pages per chunk and max
+# number of chunks of one document
+ocr_seconds_per_page = 3.0
+split_chunk_seconds = 300
+split_min_chunk_pages = 10
+split_max_chunks = 64
@@ -31,9 +31,11 @@ class DocumentFile:
     @property
     def is_image(self):
         """
+        True for png, jpeg and tiff files (same formats as
+        mime.Mime.is_image recognizes).
         """
         ext = os.path.splitext(self.abspath)[1]
-        if ext.lower() in ('.png', '.jpeg', '.jpg'):
+        if ext.lower() in ('.png', '.jpeg', '.jpg', '.tif', '.tiff'):
             return True
 
         return False
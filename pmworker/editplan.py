@@ -0,0 +1,147 @@
+import copy
+import logging
+
+from pmworker.pdfinfo import get_pagecount
+from pmworker.ocrmigrate import migrate_pages
+from pmworker.pdftk import (
+    cat,
+    cat_ranges_for_delete,
+    cat_ranges_for_reorder,
+    get_handle,
+    split_ranges
+)
+
+"""
+Edit plans - several page operations (delete, reorder, paste) on one
+document applied at once.
+
+Operations are composed into a single page mapping, i.e. for each page
+of the final document its source (document version, page number). The
+document is then rewritten once and its version is incremented once,
+instead of once per operation.
+
+Operations are dictionaries with the same arguments as functions in
+pmworker.pdftk, page numbers always refer to the document as left by
+the previous operation:
+
+    {'op': 'delete', 'page_numbers': [1, 7]}
+    {'op': 'reorder', 'new_order': [{'page_num': 2, 'page_order': 1}, ...]}
+    {
+        'op': 'paste',
+        'src_doc_ep_list': [{'doc_ep': doc_ep, 'page_nums': [1, 2]}],
+        'after_page_number': 3,  # optional
+        'before_page_number': False  # optional
+    }
+"""
+
+logger = logging.getLogger(__name__)
+
+DELETE = 'delete'
+REORDER = 'reorder'
+PASTE = 'paste'
+
+
+def apply_operation(page_sources, operation):
+    """
+    page_sources is a list of (doc_ep, page_num) - source of each page.
+    Returns page sources after given operation.
+    """
+    op = operation['op']
+    page_count = len(page_sources)
+
+    if op == DELETE:
+        pages = cat_ranges_for_delete(
+            page_count,
+            operation['page_numbers']
+        )
+    elif op == REORDER:
+        pages = cat_ranges_for_reorder(
+            page_count,
+            operation['new_order']
+        )
+    elif op == PASTE:
+        list1, list2 = split_ranges(
+            total=page_count,
+            after=operation.get('after_page_number', False),
+            before=operation.get('before_page_number', False)
+        )
+        inserted = [
+            (item['doc_ep'], page_num)
+            for item in operation['src_doc_ep_list']
+            for page_num in item['page_nums']
+        ]
+        return [page_sources[p - 1] for p in list1] + inserted + [
+            page_sources[p - 1] for p in list2
+        ]
+    else:
+        raise ValueError(f"Unknown operation {op}")
+
+    return [page_sources[p - 1] for p in pages]
+
+
+def compose(doc_ep, operations, page_count=None):
+    """
+    Returns a list of (doc_ep, page_num), source of each page of the
+    document after all operations are applied.
+    """
+    if page_count is None:
+        page_count = get_pagecount(doc_ep.url())
+
+    page_sources = [
+        (doc_ep, page_num) for page_num in range(1, page_count + 1)
+    ]
+    for operation in operations:
+        page_sources = apply_operation(page_sources, operation)
+
+    return page_sources
+
+
+def get_cat_args(page_sources):
+    """
+    Returns sources (handle -> path) and pages ((handle, page_num)) to
+    be passed to pmworker.pdftk.cat; pages of the first source document
+    are A pages, of the second B etc. (see pmworker.pdftk.get_handle).
+    """
+    handles = {}
+    sources = {}
+    pages = []
+    for doc_ep, page_num in page_sources:
+        url = doc_ep.url()
+        if url not in handles:
+            handles[url] = get_handle(len(handles))
+            sources[handles[url]] = url
+        pages.append((handles[url], page_num))
+
+    return sources, pages
+
+
+def edit_pages(doc_ep, operations, migrate_ocr=False, s3_migrate=False):
+    """
+    Applies operations (see module docstring) to the document with
+    one rewrite and one version increment.
+
+    With migrate_ocr=True, OCR artifacts of all pages are copied into
+    the new document version; with s3_migrate=True they are copied
+    in S3 as well.
+
+    Returns new version of the document.
+    """
+    old_doc_ep = copy.copy(doc_ep)
+    # first source (A) is always the edited document itself
+    page_sources = compose(old_doc_ep, operations)
+    sources, pages = get_cat_args(
+        [(old_doc_ep, 1)] + page_sources
+    )
+    logger.debug(
+        f"edit_pages {doc_ep.url()} operations={len(operations)}"
+        f" page_count={len(page_sources)}"
+    )
+
+    doc_ep.inc_version()
+
+    cat(sources, pages[1:], doc_ep.url())
+
+    if migrate_ocr:
+        migrate_pages(doc_ep, page_sources, s3=s3_migrate)
+
+    return doc_ep.version
@@ -4,3 +4,35 @@ class FileNotFound(Exception):
 
 class InvalidLanguageArgument(Exception):
     pass
+
+
+class UploadError(Exception):
+    """
+    One or more artifacts failed to upload.
+
+    errors is a list of (url, exception) tuples.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "Failed to upload: " + ", ".join(
+                f"{url} ({exc})" for url, exc in errors
+            )
+        )
+
+
+class DeleteError(Exception):
+    """
+    One or more objects could not be deleted.
+
+    errors is a list of (url, message) tuples.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "Failed to delete: " + ", ".join(
+                f"{url} ({message})" for url, message in errors
+            )
+        )
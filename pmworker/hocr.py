@@ -0,0 +1,121 @@
+import re
+import logging
+
+"""
+Helpers for manipulating hOCR files produced by tesseract.
+"""
+
+logger = logging.getLogger(__name__)
+
+HOCR_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{lang}" lang="{lang}">
+ <head>
+  <title></title>
+  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>
+  <meta name='ocr-system' content='{system}' />
+  <meta name='ocr-capabilities' content='ocr_page ocr_carea ocr_par ocr_line ocrx_word ocrp_wconf'/>
+ </head>
+ <body>
+{body}
+ </body>
+</html>
+"""
+
+TITLE_RE = re.compile(r"title=(['\"])(.*?)\1", re.DOTALL)
+
+# hOCR properties whose values are pixel lengths (all values scaled).
+LENGTH_PROPERTIES = (
+    'bbox',
+    'x_size',
+    'x_descenders',
+    'x_ascenders',
+)
+
+
+def _fmt(value):
+    if isinstance(value, int):
+        return str(value)
+    # keep tesseract formatting of floats e.g. 'x_size 27.5'
+    return ("%.2f" % value).rstrip('0').rstrip('.')
+
+
+def _scale_property(prop, factor, image):
+    parts = prop.strip().split()
+    if not parts:
+        return prop
+
+    name, values = parts[0], parts[1:]
+
+    if name in LENGTH_PROPERTIES:
+        scaled = []
+        for value in values:
+            if name == 'bbox':
+                scaled.append(int(round(int(value) * factor)))
+            else:
+                scaled.append(float(value) * factor)
+        return ' '.join([name] + [_fmt(v) for v in scaled])
+
+    if name == 'baseline' and len(values) == 2:
+        # baseline <slope> <offset>, slope is dimensionless, offset
+        # is in pixels.
+        offset = int(round(float(values[1]) * factor))
+        return f"baseline {values[0]} {offset}"
+
+    if name == 'image' and image:
+        return f'image "{image}"'
+
+    return prop.strip()
+
+
+def rescale_hocr(content, factor, image=None):
+    """
+    Returns hOCR content (string) with all coordinates
+    multiplied by factor.
+
+    Used to derive hOCR for different page zoom levels (Steps)
+    from one single OCR run; e.g. hOCR of 125% step is
+    rescale_hocr(content_100, 1.25).
+
+    image - if given, replaces path of the image in ocr_page title.
+    """
+    def repl(match):
+        quote, title = match.group(1), match.group(2)
+        props = [
+            _scale_property(prop, factor, image)
+            for prop in title.split(';')
+        ]
+        return f"title={quote}{'; '.join(props)}{quote}"
+
+    return TITLE_RE.sub(repl, content)
+
+
+def set_hocr_image(content, image):
+    """
+    Returns hOCR content (string) with path of the image in ocr_page
+    title replaced by image; nothing else is changed.
+    """
+    def repl(match):
+        quote, title = match.group(1), match.group(2)
+        props = [
+            prop[:len(prop) - len(prop.lstrip())] + f'image "{image}"'
+            if prop.strip().startswith('image ') else prop
+            for prop in title.split(';')
+        ]
+        return f"title={quote}{';'.join(props)}{quote}"
+
+    return TITLE_RE.sub(repl, content)
+
+
+def wrap_hocr_page(body, lang, system='tesseract'):
+    """
+    Wraps hOCR page fragment(s) (i.e. one or more ocr_page div elements)
+    into a complete XHTML document, same as the one generated by
+    tesseract command line utility.
+    """
+    return HOCR_TEMPLATE.format(
+        lang=lang.split('+')[0],
+        system=system,
+        body=body.rstrip()
+    )
@@ -0,0 +1,306 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from pmworker.endpoint import Endpoint
+from pmworker.settings import get_settings
+from pmworker.storage import get_backend
+
+"""
+Local (MEDIA_ROOT) copies of documents and page artifacts managed as
+a cache:
+
+    * local copy of a document is revalidated against remote ETag
+      every time it is accessed
+    * total size of local files (under docs/ and results/) is kept
+      within local_cache_max_bytes by removing least recently used files
+    * files used by a running task are pinned i.e. never evicted
+"""
+
+logger = logging.getLogger(__name__)
+
+# local directories (relative to MEDIA_ROOT) subject to eviction
+CACHED_DIRS = ('docs', 'results')
+# cache's metadata (ETags, access times, pins) directory relative to
+# MEDIA_ROOT
+META_DIR = '.cache'
+# eviction walks whole MEDIA_ROOT; do it at most every that many seconds
+DEFAULT_EVICT_INTERVAL = 60
+
+
+def _digest(path):
+    return hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+class LocalCache:
+
+    def __init__(
+        self,
+        root,
+        max_bytes=None,
+        evict_interval=DEFAULT_EVICT_INTERVAL
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.etags_dir = os.path.join(root, META_DIR, 'etags')
+        self.pins_dir = os.path.join(root, META_DIR, 'pins')
+        self.access_dir = os.path.join(root, META_DIR, 'access')
+        self._last_evict = 0
+        self._lock = threading.Lock()
+
+    # ETags
+
+    def _etag_path(self, path):
+        return os.path.join(self.etags_dir, _digest(path))
+
+    def get_etag(self, path):
+        try:
+            with open(self._etag_path(path), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_etag(self, path, etag):
+        os.makedirs(self.etags_dir, exist_ok=True)
+        with open(self._etag_path(path), 'w') as f:
+            f.write(etag)
+
+    # pins
+
+    @contextmanager
+    def pinned(self, *paths):
+        """
+        Files (or directories) under given paths are not evicted
+        while within this context. Pins are visible to all worker
+        processes of the node.
+        """
+        os.makedirs(self.pins_dir, exist_ok=True)
+        pin_files = []
+        for path in paths:
+            pin_file = os.path.join(
+                self.pins_dir,
+                f"{_digest(path)}.{os.getpid()}.{threading.get_ident()}"
+            )
+            with open(pin_file, 'w') as f:
+                f.write(path)
+            pin_files.append(pin_file)
+        try:
+            yield
+        finally:
+            for pin_file in pin_files:
+                try:
+                    os.remove(pin_file)
+                except FileNotFoundError:
+                    pass
+
+    def pinned_paths(self):
+        """
+        Returns a set of currently pinned paths. Pins left behind by
+        no longer running processes are removed.
+        """
+        paths = set()
+        if not os.path.isdir(self.pins_dir):
+            return paths
+
+        for name in os.listdir(self.pins_dir):
+            pin_file = os.path.join(self.pins_dir, name)
+            pid = int(name.split('.')[1])
+            if not _pid_alive(pid):
+                # other process may be removing the same stale pin
+                try:
+                    os.remove(pin_file)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(pin_file, 'r') as f:
+                    paths.add(f.read())
+            except FileNotFoundError:
+                continue
+
+        return paths
+
+    # access and eviction
+
+    def _access_path(self, path):
+        return os.path.join(self.access_dir, _digest(path))
+
+    def touch(self, path):
+        """
+        Marks local file as recently used. Access time is recorded
+        by mtime of a marker file; file's own mtime is left intact as
+        it is part of cache keys of results derived from the file (see
+        utils.file_version).
+        """
+        os.makedirs(self.access_dir, exist_ok=True)
+        marker = self._access_path(path)
+        with open(marker, 'a'):
+            pass
+        os.utime(marker)
+
+    def _access_times(self):
+        """
+        Returns a dictionary digest of path -> last access time.
+        """
+        if not os.path.isdir(self.access_dir):
+            return {}
+
+        access_times = {}
+        for entry in os.scandir(self.access_dir):
+            try:
+                access_times[entry.name] = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+
+        return access_times
+
+    def fetch(self, model_endpoint):
+        """
+        Makes sure local copy of model_endpoint (e.g. DocumentEp) is
+        present and up to date. A single conditional GET is issued: if
+        remote object didn't change (same ETag), nothing is downloaded.
+
+        Returns False if remote object does not exist.
+        """
+        local_abspath = model_endpoint.url()
+        remote_abspath = model_endpoint.url(ep=Endpoint.S3)
+        etag = None
+        if os.path.exists(local_abspath):
+            etag = self.get_etag(local_abspath)
+
+        new_etag = get_backend(remote_abspath).get(
+            remote_abspath,
+            local_abspath,
+            etag=etag
+        )
+        if new_etag is None:
+            logger.info(f"Endpoint {remote_abspath} missing")
+            return False
+
+        if new_etag == etag:
+            logger.debug(f"Local copy {local_abspath} is up to date")
+            self.touch(local_abspath)
+        else:
+            logger.debug(f"Downloaded {remote_abspath} to {local_abspath}")
+            self.set_etag(local_abspath, new_etag)
+
+        self.maybe_evict()
+
+        return True
+
+    def _files(self):
+        """
+        Returns a list of (last use time, size, path) of all local files;
+        last use time is the later of modification and access (touch)
+        time.
+        """
+        access_times = self._access_times()
+        files = []
+        for dirname in CACHED_DIRS:
+            top = os.path.join(self.root, dirname)
+            for dirpath, _, filenames in os.walk(top):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    used = max(
+                        stat.st_mtime,
+                        access_times.get(_digest(path), 0)
+                    )
+                    files.append((used, stat.st_size, path))
+
+        return files
+
+    def maybe_evict(self):
+        if not self.max_bytes:
+            return
+
+        with self._lock:
+            if time.time() - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = time.time()
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used (unpinned) files until total size of
+        local files fits into max_bytes.
+        """
+        files = sorted(self._files())
+        size = sum(item[1] for item in files)
+        if not self.max_bytes or size <= self.max_bytes:
+            return
+
+        pinned = self.pinned_paths()
+        for mtime, file_size, path in files:
+            if size <= self.max_bytes:
+                break
+            if any(
+                path == pin or path.startswith(pin.rstrip(os.sep) + os.sep)
+                for pin in pinned
+            ):
+                continue
+
+            logger.debug(f"Local cache evict {path}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                for meta_path in (
+                    self._etag_path(path),
+                    self._access_path(path)
+                ):
+                    try:
+                        os.remove(meta_path)
+                    except FileNotFoundError:
+                        pass
+            try:
+                os.removedirs(os.path.dirname(path))
+            except OSError:
+                # directory not empty
+                pass
+            size -= file_size
+
+
+_local_cache = None
+
+
+def get_local_cache():
+    """
+    Returns LocalCache of MEDIA_ROOT (local_storage setting). Byte budget
+    is local_cache_max_bytes setting (None - no eviction).
+    """
+    global _local_cache
+
+    if _local_cache is None:
+        settings = get_settings()
+        _local_cache = LocalCache(
+            root=Endpoint(settings.local_storage).dirname,
+            max_bytes=getattr(settings, 'local_cache_max_bytes', None),
+            evict_interval=getattr(
+                settings,
+                'local_cache_evict_interval',
+                DEFAULT_EVICT_INTERVAL
+            )
+        )
+
+    return _local_cache
@@ -1,9 +1,54 @@
 import logging
+from functools import lru_cache
+
 from pmworker import wrapper
+from pmworker.utils import file_version
 
 
 logger = logging.getLogger(__name__)
 
+# number of bytes read from the beginning of the file when sniffing
+HEADER_SIZE = 4096
+
+# (offset limit, signature, mime type); signature is searched in first
+# 'offset limit' + len(signature) bytes of the file.
+SIGNATURES = (
+    # PDF readers accept %PDF- header anywhere in first 1024 bytes
+    (1024, b'%PDF-', 'application/pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+)
+
+
+def sniff(filepath):
+    """
+    Returns MIME type of the file based on its magic bytes, or None
+    if file format is not one of PDF, PNG, JPEG, TIFF.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+
+    for limit, signature, mime_type in SIGNATURES:
+        if header.find(signature, 0, limit + len(signature)) >= 0:
+            return mime_type
+
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _guess(filepath, size, mtime):
+    """
+    size and mtime are part of cache key only; they make
+    sure that cached value is discarded when file changes.
+    """
+    mime_type = sniff(filepath)
+    if mime_type:
+        return mime_type
+
+    return Mime(filepath).guess_with_file()
+
 
 class Mime(wrapper.Wrapper):
     def __init__(self, filepath):
@@ -15,7 +60,7 @@ class Mime(wrapper.Wrapper):
 
         cmd.extend(['--mime-type'])
         cmd.extend(['-b'])
-        cmd.extend([self.filepath])
+        cmd.extend([str(self.filepath)])
 
         return cmd
 
@@ -33,6 +78,21 @@ class Mime(wrapper.Wrapper):
         return 'image' in self.guess()
 
     def guess(self):
+        """
+        Returns MIME type of the file.
+
+        PDF, PNG, JPEG and TIFF files are recognized in-process by
+        their magic bytes; `file` command line utility is used
+        for all other formats. Result is cached until file changes.
+        """
+        try:
+            version = file_version(self.filepath)
+        except OSError:
+            return self.guess_with_file()
+
+        return _guess(str(self.filepath), *version)
+
+    def guess_with_file(self):
         cmd = self.get_cmd()
         complete = self.run(cmd)
 
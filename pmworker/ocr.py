@@ -0,0 +1,197 @@
+import os
+import copy
+import shutil
+import logging
+
+from PIL import Image
+
+from pmworker.step import (Step, Steps)
+from pmworker.hocr import (
+    rescale_hocr,
+    wrap_hocr_page
+)
+from pmworker.blank import is_blank_page
+from pmworker.tesseract import Tesseract
+from pmworker import ocr_engine
+from pmworker import ocr_cache
+from pmworker.textlayer import extract_text_layer
+
+logger = logging.getLogger(__name__)
+
+# blank pages are detected on images of this step
+BLANK_STEP_PERCENT = 50
+
+
+def extract_txt_hocr(page_url, lang):
+    """
+    OCRs page_url.img_url() image once and writes both
+    page_url.txt_url() and page_url.hocr_url() files.
+
+    Uses pooled OCR engines if tesserocr is installed, otherwise
+    runs tesseract command line utility.
+    """
+    img_url = page_url.img_url()
+    hocr_url = page_url.hocr_url()
+    txt_url = page_url.txt_url()
+    output_base, _ = os.path.splitext(hocr_url)
+
+    for path in (hocr_url, txt_url):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if ocr_engine.is_available():
+        # reuse one of already started engines
+        logger.debug(f"OCR (engine pool) {img_url}")
+        with ocr_engine.get_engine_pool().engine(lang) as engine:
+            text, hocr = engine.ocr(img_url)
+
+        with open(txt_url, 'w', encoding='utf-8') as f:
+            f.write(text)
+        with open(hocr_url, 'w', encoding='utf-8') as f:
+            f.write(hocr)
+
+        return
+
+    logger.debug(f"OCR {img_url} -> {output_base}.(txt|hocr)")
+    Tesseract(lang=lang)(
+        image_path=img_url,
+        output_base=output_base,
+        configs=('txt', 'hocr')
+    )
+    # tesseract places txt file next to the hocr one
+    shutil.move(f"{output_base}.txt", txt_url)
+
+
+def rescale_hocr_from(src_page_url, dst_page_url):
+    """
+    Writes dst_page_url.hocr_url() by rescaling bbox coordinates of
+    already existing src_page_url.hocr_url().
+
+    Both page urls point to the same page, but with different steps;
+    hOCR is rescaled by the ratio of their widths, i.e.
+    dst.step.width / Step.WIDTH_100p when source is 100% step.
+    """
+    factor = dst_page_url.step.width / src_page_url.step.width
+
+    with open(src_page_url.hocr_url(), 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    dst_hocr_url = dst_page_url.hocr_url()
+    os.makedirs(os.path.dirname(dst_hocr_url), exist_ok=True)
+
+    with open(dst_hocr_url, 'w', encoding='utf-8') as f:
+        f.write(
+            rescale_hocr(
+                content,
+                factor=factor,
+                image=dst_page_url.img_url()
+            )
+        )
+
+
+def get_cached_txt_hocr(cache, key, page_url):
+    """
+    Copies cached OCR results into page_url.txt_url() and
+    page_url.hocr_url(). Returns True on cache hit.
+    """
+    txt_url = page_url.txt_url()
+    hocr_url = page_url.hocr_url()
+    for path in (hocr_url, txt_url):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if not cache.get(key, txt_url, hocr_url):
+        logger.debug(f"OCR cache miss {key} for {txt_url}")
+        return False
+
+    logger.debug(f"OCR cache hit {key} for {txt_url}")
+    # cached hocr refers to the image it was created from
+    with open(hocr_url, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with open(hocr_url, 'w', encoding='utf-8') as f:
+        f.write(
+            rescale_hocr(content, factor=1, image=page_url.img_url())
+        )
+
+    return True
+
+
+def write_blank_txt_hocr(page_url, lang):
+    """
+    Writes empty txt and hocr (ocr_page element only) files.
+    """
+    txt_url = page_url.txt_url()
+    hocr_url = page_url.hocr_url()
+    for path in (hocr_url, txt_url):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with Image.open(page_url.img_url()) as image:
+        width, height = image.size
+
+    with open(txt_url, 'w', encoding='utf-8') as f:
+        f.write('')
+    with open(hocr_url, 'w', encoding='utf-8') as f:
+        f.write(
+            wrap_hocr_page(
+                f"  <div class='ocr_page' id='page_1' title='image"
+                f" \"{page_url.img_url()}\"; bbox 0 0 {width} {height};"
+                f" ppageno 0'>\n  </div>",
+                lang=lang
+            )
+        )
+
+
+def ocr_rendered_page(page_url, lang):
+    """
+    OCRs a page whose images were already rendered (for all Steps).
+
+    Pages with usable embedded text layer and blank pages are not
+    OCRed at all.
+    If OCR cache is configured and this very page image was already
+    OCRed (with same lang), cached results are used instead.
+
+    Tesseract runs once on the 100% image and yields both txt and hocr;
+    hocr files for all other non thumbnail steps are derived from
+    that one.
+
+    Returns the way txt/hocr were obtained: 'blank', 'text_layer',
+    'cache' or 'ocr'.
+    """
+    ref_page_url = copy.copy(page_url)
+    ref_page_url.step = Step(Step.LIST.index(Step.PERCENT))
+    blank_page_url = copy.copy(page_url)
+    blank_page_url.step = Step(Step.LIST.index(BLANK_STEP_PERCENT))
+
+    cache = ocr_cache.get_ocr_cache()
+    if extract_text_layer(ref_page_url, lang=lang):
+        # born-digital page, no OCR needed
+        method = 'text_layer'
+    elif is_blank_page(blank_page_url.img_url()):
+        method = 'blank'
+        write_blank_txt_hocr(ref_page_url, lang=lang)
+    elif cache:
+        key = ocr_cache.cache_key(ref_page_url.img_url(), lang)
+        if get_cached_txt_hocr(cache, key, ref_page_url):
+            method = 'cache'
+        else:
+            method = 'ocr'
+            extract_txt_hocr(
+                ref_page_url,
+                lang=lang
+            )
+            cache.put(key, ref_page_url.txt_url(), ref_page_url.hocr_url())
+    else:
+        method = 'ocr'
+        extract_txt_hocr(
+            ref_page_url,
+            lang=lang
+        )
+
+    dst_page_url = copy.copy(page_url)
+    for step in Steps():
+        if not step.is_thumbnail and step.percent != Step.PERCENT:
+            dst_page_url.step = step
+            rescale_hocr_from(
+                src_page_url=ref_page_url,
+                dst_page_url=dst_page_url
+            )
+
+    return method
@@ -0,0 +1,278 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import Counter
+
+from pmworker.step import Step
+from pmworker.settings import get_settings
+from pmworker.storage import get_backend
+from pmworker import ocr_engine
+
+"""
+Content addressed cache of OCR results.
+
+Cache key is sha256 of the rendered page image (the one fed to OCR)
+plus OCR language and OCR settings. Thus identical pages (e.g. same
+scanned form uploaded over and over again or pages of a new document
+version) are OCRed only once.
+
+There are two tiers:
+
+    * local directory (ocr_cache_dir setting), size bounded
+      (ocr_cache_max_bytes setting) with LRU eviction
+    * optional remote prefix (ocr_cache_s3_url setting e.g.
+      s3:/bucket/ocr-cache/), shared by all workers
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+TXT_NAME = "page.txt"
+HOCR_NAME = "page.hocr"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats():
+    """
+    Returns a dictionary with hit/miss counters of current process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def cache_key(img_path, lang):
+    """
+    sha256 hex digest of image content, OCR language and OCR
+    settings (engine and resolution of the image OCR is performed on).
+    """
+    engine = 'tesserocr' if ocr_engine.is_available() else 'tesseract'
+    digest = hashlib.sha256()
+    digest.update(
+        f"lang={lang};engine={engine};width={Step.WIDTH_100p};".encode()
+    )
+    with open(img_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class LocalTier:
+
+    def __init__(self, dirname, max_bytes=DEFAULT_MAX_BYTES):
+        self.dirname = dirname
+        self.max_bytes = max_bytes
+        # approximate size of the cache; recomputed on eviction
+        self._size = None
+        self._lock = threading.Lock()
+
+    def entry_dir(self, key):
+        return os.path.join(self.dirname, key[:2], key)
+
+    def get(self, key, txt_path, hocr_path):
+        entry_dir = self.entry_dir(key)
+        try:
+            shutil.copyfile(os.path.join(entry_dir, TXT_NAME), txt_path)
+            shutil.copyfile(os.path.join(entry_dir, HOCR_NAME), hocr_path)
+            # entry's mtime is its last access time (for LRU)
+            os.utime(entry_dir)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def put(self, key, txt_path, hocr_path):
+        entry_dir = self.entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+        shutil.copyfile(txt_path, os.path.join(tmp_dir, TXT_NAME))
+        shutil.copyfile(hocr_path, os.path.join(tmp_dir, HOCR_NAME))
+        try:
+            # complete entry appears atomically
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # same entry was just added by another worker
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        added = os.path.getsize(txt_path) + os.path.getsize(hocr_path)
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+            if self._size is None or self._size > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        """
+        Returns a list of (mtime, size, path) of all cache entries.
+        """
+        entries = []
+        for prefix in os.scandir(self.dirname):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                try:
+                    size = sum(
+                        item.stat().st_size for item in os.scandir(entry.path)
+                    )
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    # entry removed meanwhile
+                    continue
+
+        return entries
+
+    def evict(self):
+        """
+        Removes least recently used entries until cache fits
+        into max_bytes.
+        """
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+
+        for mtime, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            logger.debug(f"OCR cache evict {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            size -= entry_size
+            _count('evictions')
+
+        self._size = size
+
+
+class S3Tier:
+    """
+    Remote tier, stored in any storage backend (despite the name, url
+    can be e.g. local:/mnt/nfs/ocr-cache/ as well).
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.backend = get_backend(url)
+
+    def entry_url(self, key, name):
+        return '/'.join((self.url, key[:2], key, name))
+
+    def get(self, key, txt_path, hocr_path):
+        for name, path in ((TXT_NAME, txt_path), (HOCR_NAME, hocr_path)):
+            try:
+                etag = self.backend.get(self.entry_url(key, name), path)
+            except Exception:
+                logger.warning(
+                    f"Failed to read OCR result {key} from {self.url}",
+                    exc_info=True
+                )
+                return False
+            if etag is None:
+                return False
+
+        return True
+
+    def put(self, key, txt_path, hocr_path):
+        for name, path in ((TXT_NAME, txt_path), (HOCR_NAME, hocr_path)):
+            self.backend.put(path, self.entry_url(key, name))
+
+
+class OcrCache:
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+
+    def get(self, key, txt_path, hocr_path):
+        """
+        Copies cached txt and hocr results into txt_path and hocr_path.
+        Returns True on cache hit.
+
+        On hit in a slower tier, result is stored in faster
+        tiers as well. Failing tier is treated as a miss.
+        """
+        for idx, tier in enumerate(self.tiers):
+            try:
+                hit = tier.get(key, txt_path, hocr_path)
+            except Exception:
+                # cache is an optimization only, never fail OCR due to it
+                logger.warning(
+                    f"Failed to read OCR result {key} from {tier}",
+                    exc_info=True
+                )
+                _count('errors')
+                continue
+
+            if hit:
+                _count('hits')
+                _count(f"hits_{type(tier).__name__}")
+                self._put(self.tiers[:idx], key, txt_path, hocr_path)
+                return True
+
+        _count('misses')
+        return False
+
+    def put(self, key, txt_path, hocr_path):
+        self._put(self.tiers, key, txt_path, hocr_path)
+
+    def _put(self, tiers, key, txt_path, hocr_path):
+        for tier in tiers:
+            try:
+                tier.put(key, txt_path, hocr_path)
+            except Exception:
+                # cache is an optimization only, never fail OCR due to it
+                logger.warning(
+                    f"Failed to store OCR result {key} in {tier}",
+                    exc_info=True
+                )
+                _count('errors')
+
+
+def get_ocr_cache():
+    """
+    Returns OcrCache instance configured from settings or None if
+    neither ocr_cache_dir nor ocr_cache_s3_url is set.
+    """
+    settings = get_settings()
+    tiers = []
+
+    dirname = getattr(settings, 'ocr_cache_dir', None)
+    if dirname:
+        tiers.append(
+            _local_tier(
+                dirname,
+                getattr(settings, 'ocr_cache_max_bytes', DEFAULT_MAX_BYTES)
+            )
+        )
+
+    s3_url = getattr(settings, 'ocr_cache_s3_url', None)
+    if s3_url:
+        tiers.append(S3Tier(s3_url))
+
+    if not tiers:
+        return None
+
+    return OcrCache(tiers)
+
+
+_local_tiers = {}
+
+
+def _local_tier(dirname, max_bytes):
+    # local tier keeps track of cache size, thus one instance per
+    # directory is shared within the process
+    key = (dirname, max_bytes)
+    if key not in _local_tiers:
+        _local_tiers[key] = LocalTier(dirname, max_bytes)
+
+    return _local_tiers[key]
@@ -0,0 +1,156 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+from pmworker.hocr import wrap_hocr_page
+from pmworker.settings import get_settings
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+"""
+Pool of long lived OCR engines.
+
+Starting tesseract command line utility loads language models
+(e.g. deu.traineddata) on every call. With tesserocr installed, engines
+(tesseract API instances) are kept alive in a per process pool and reused
+across pages and tasks; language models are loaded only once per engine.
+"""
+
+logger = logging.getLogger(__name__)
+
+# default number of pages OCRed by one engine before it is recycled
+DEFAULT_MAX_PAGES = 200
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def is_available():
+    return tesserocr is not None
+
+
+class Engine:
+    """
+    tesseract API instance with language model(s) loaded.
+    """
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.pages = 0
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def ocr(self, image_path):
+        """
+        Returns a tuple (text, hocr) for given image.
+        """
+        self.api.SetImageFile(image_path)
+        text = self.api.GetUTF8Text()
+        hocr = wrap_hocr_page(
+            self.api.GetHOCRText(0),
+            lang=self.lang
+        )
+        self.pages += 1
+
+        return text, hocr
+
+    def close(self):
+        self.api.End()
+
+
+class EnginePool:
+    """
+    Keeps up to size idle engines per language (combination);
+    engine is closed and replaced by a new one after max_pages pages.
+    """
+
+    def __init__(self, size, max_pages, factory=Engine):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self._idle = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, lang):
+        with self._lock:
+            if lang not in self._semaphores:
+                self._semaphores[lang] = threading.BoundedSemaphore(
+                    self.size
+                )
+                self._idle[lang] = []
+            return self._semaphores[lang]
+
+    @contextmanager
+    def engine(self, lang):
+        """
+        Borrows an engine for given language; blocks while all
+        size engines for that language are in use.
+        """
+        semaphore = self._semaphore(lang)
+        semaphore.acquire()
+        try:
+            with self._lock:
+                idle = self._idle[lang]
+                engine = idle.pop() if idle else None
+
+            if engine is None:
+                logger.debug(f"Starting new OCR engine lang={lang}")
+                engine = self.factory(lang)
+
+            try:
+                yield engine
+            except Exception:
+                # engine state is unknown, don't reuse it
+                engine.close()
+                raise
+
+            if engine.pages >= self.max_pages:
+                logger.debug(
+                    f"Recycling OCR engine lang={lang}"
+                    f" pages={engine.pages}"
+                )
+                engine.close()
+            else:
+                with self._lock:
+                    self._idle[lang].append(engine)
+        finally:
+            semaphore.release()
+
+    def close(self):
+        with self._lock:
+            for engines in self._idle.values():
+                for engine in engines:
+                    engine.close()
+            self._idle = {lang: [] for lang in self._idle}
+
+
+def get_engine_pool():
+    """
+    Returns engine pool of current process.
+
+    Pool is created lazily; a forked process (e.g. celery pool child)
+    never reuses engines of its parent and gets a pool of its own.
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            settings = get_settings()
+            # one engine per concurrently OCRed page; pages are OCRed
+            # concurrently by worker threads and by ocr_document
+            size = getattr(settings, 'ocr_engine_pool_size', None) or max(
+                getattr(settings, 'worker_concurrency', None) or 1,
+                getattr(settings, 'ocr_document_concurrency', None) or 1
+            )
+            max_pages = getattr(
+                settings, 'ocr_engine_max_pages', DEFAULT_MAX_PAGES
+            )
+            _pool = EnginePool(size=size, max_pages=max_pages)
+            _pool_pid = os.getpid()
+
+    return _pool
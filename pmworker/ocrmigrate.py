@@ -0,0 +1,217 @@
+import os
+import re
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from pmworker.endpoint import (
+    Endpoint,
+    PageEp
+)
+from pmworker.step import Steps
+from pmworker.hocr import set_hocr_image
+from pmworker.storage import (
+    get_backend,
+    get_s3_pool_size,
+    urls_exist
+)
+from pmworker import pdfinfo
+
+"""
+Migration of OCR artifacts (txt, hocr and jpg files of all Steps)
+between document versions.
+
+Page operations (reorder, delete, paste) create a new document version
+with exactly the same page content, only at different positions. Instead
+of OCRing the new version again, artifacts of each page are copied to
+their new location.
+
+Local artifacts are copied, not hard linked, as they are rewritten in
+place when a page is OCRed again; previous versions must stay intact.
+Image path in migrated local hOCR files is changed to the new location.
+Remote (S3) artifacts are copied server side, so remote hOCR files keep
+the image path of the page they were copied from.
+"""
+
+logger = logging.getLogger(__name__)
+
+PAGE_DIR_RE = re.compile(r"^page_(\d+)$")
+
+
+def get_pagecount(doc_ep):
+    """
+    Returns number of pages with OCR results of given document, i.e.
+    number of page_<num> directories in doc_ep.pages_dirname.
+    """
+    pages_dirname = doc_ep.pages_dirname
+    if not os.path.isdir(pages_dirname):
+        return 0
+
+    return len([
+        name for name in os.listdir(pages_dirname)
+        if PAGE_DIR_RE.match(name) and os.path.isdir(
+            os.path.join(pages_dirname, name)
+        )
+    ])
+
+
+def get_assigns_after_delete(total_pages, deleted_pages):
+    """
+    Returns a list of tuples (new_page_num, old_page_num) i.e. for
+    each page of the new version, the page of the old version it gets
+    content from.
+    """
+    if total_pages < len(deleted_pages):
+        raise ValueError(
+            f"total_pages={total_pages} < deleted_pages={deleted_pages}"
+        )
+
+    deleted = set(deleted_pages)
+    remaining = [
+        page_num for page_num in range(1, total_pages + 1)
+        if page_num not in deleted
+    ]
+
+    return list(enumerate(remaining, 1))
+
+
+def get_assigns_after_reorder(new_order):
+    """
+    new_order is a list of {'page_num': <old>, 'page_order': <new>}
+    dictionaries (same as for pdftk.reorder_pages).
+
+    Returns a list of tuples (new_page_num, old_page_num).
+    """
+    return sorted(
+        (int(item['page_order']), int(item['page_num']))
+        for item in new_order
+    )
+
+
+def get_assigns_after_paste(page_sources):
+    """
+    page_sources is a list of (doc_ep, page_num) tuples, one for each
+    page of the newly created document version, in order.
+
+    Returns a list of tuples (new_page_num, doc_ep, old_page_num).
+    """
+    return [
+        (new_page_num, doc_ep, page_num)
+        for new_page_num, (doc_ep, page_num) in enumerate(page_sources, 1)
+    ]
+
+
+def copy_artifact(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copyfile(src, dst)
+
+
+def copy_hocr(src, dst, dst_img):
+    """
+    Copies hOCR file pointing it to dst_img image.
+    """
+    with open(src, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with open(dst, 'w', encoding='utf-8') as f:
+        f.write(set_hocr_image(content, dst_img))
+
+
+def page_artifact_urls(page_ep, ep=Endpoint.LOCAL):
+    """
+    Yields urls of all artifacts of the page: txt, hocr of
+    non thumbnail steps and images of all steps.
+    """
+    yield page_ep.txt_url(ep=ep)
+    for step in Steps():
+        page_ep.step = step
+        if not step.is_thumbnail:
+            yield page_ep.hocr_url(ep=ep)
+        yield page_ep.img_url(ep=ep)
+
+
+def migrate_page(src_page_ep, dst_page_ep):
+    """
+    Copies all local artifacts of src_page_ep to dst_page_ep locations.
+    """
+    if os.path.exists(src_page_ep.txt_url()):
+        copy_artifact(src_page_ep.txt_url(), dst_page_ep.txt_url())
+
+    for step in Steps():
+        src_page_ep.step = step
+        dst_page_ep.step = step
+        src_hocr = src_page_ep.hocr_url()
+        if not step.is_thumbnail and os.path.exists(src_hocr):
+            copy_hocr(
+                src_hocr,
+                dst_page_ep.hocr_url(),
+                dst_img=dst_page_ep.img_url()
+            )
+        if os.path.exists(src_page_ep.img_url()):
+            copy_artifact(src_page_ep.img_url(), dst_page_ep.img_url())
+
+
+def migrate_page_s3(src_page_ep, dst_page_ep):
+    """
+    Copies (server side) all remote (S3) artifacts of src_page_ep to
+    dst_page_ep locations. Missing artifacts (e.g. thumbnails which are
+    not uploaded) are skipped; they are found with a single listing
+    of page's prefix.
+    """
+    src_urls = list(page_artifact_urls(src_page_ep, ep=Endpoint.S3))
+    dst_urls = page_artifact_urls(dst_page_ep, ep=Endpoint.S3)
+    existing = urls_exist(src_urls)
+    for src_url, dst_url in zip(src_urls, dst_urls):
+        if existing[src_url]:
+            get_backend(src_url).copy(src_url, dst_url)
+
+
+def migrate_pages(dst_doc_ep, page_sources, s3=False):
+    """
+    Migrates OCR artifacts to the (new version of) dst_doc_ep.
+
+    page_sources is a list of (doc_ep, page_num) tuples, one for each
+    page of dst_doc_ep, in order; doc_ep must point to the version of
+    the source document the page was taken from.
+
+    With s3=True, artifacts are copied in S3 as well.
+    """
+    dst_page_count = len(page_sources)
+    src_page_counts = {}
+    page_eps = []
+
+    for new_page_num, doc_ep, page_num in get_assigns_after_paste(
+        page_sources
+    ):
+        src_url = doc_ep.url()
+        if src_url not in src_page_counts:
+            src_page_counts[src_url] = pdfinfo.get_pagecount(src_url)
+
+        src_page_ep = PageEp(
+            document_ep=doc_ep,
+            page_num=page_num,
+            page_count=src_page_counts[src_url]
+        )
+        dst_page_ep = PageEp(
+            document_ep=dst_doc_ep,
+            page_num=new_page_num,
+            page_count=dst_page_count
+        )
+        logger.debug(
+            f"Migrate page {src_page_ep.url()} -> {dst_page_ep.url()}"
+        )
+        migrate_page(src_page_ep, dst_page_ep)
+        page_eps.append((src_page_ep, dst_page_ep))
+
+    if not s3:
+        return
+
+    # one copy request per pooled connection at a time
+    with ThreadPoolExecutor(max_workers=get_s3_pool_size()) as executor:
+        futures = [
+            executor.submit(migrate_page_s3, src, dst)
+            for src, dst in page_eps
+        ]
+        for future in futures:
+            future.result()
@@ -0,0 +1,103 @@
+import os
+import logging
+import tempfile
+
+from pmworker.settings import get_settings
+
+try:
+    import pikepdf
+    from pikepdf import PdfError
+except ImportError:
+    pikepdf = None
+
+    class PdfError(Exception):
+        pass
+
+"""
+In process PDF page operations (cat, reorder, delete, insert).
+
+With pikepdf installed, pages are copied (as PDF objects, without
+re-rendering or re-compressing them) from one or more source documents
+into the output document within worker process. Otherwise (or with
+pdf_engine setting set to 'pdftk') pdftk command line utility is used.
+"""
+
+logger = logging.getLogger(__name__)
+
+PIKEPDF = 'pikepdf'
+PDFTK = 'pdftk'
+
+
+def is_available():
+    return pikepdf is not None
+
+
+# missing pikepdf is reported once per process
+_warned = False
+
+
+def use_pikepdf():
+    global _warned
+
+    engine = getattr(get_settings(), 'pdf_engine', None)
+    if engine == PDFTK:
+        return False
+    if engine == PIKEPDF and not is_available() and not _warned:
+        logger.warning("pikepdf is not installed, using pdftk instead")
+        _warned = True
+
+    return is_available()
+
+
+def get_pagecount(path):
+    """
+    Returns number of pages of PDF document (number of leaves of its
+    page tree; /Count entries are not trusted).
+    """
+    with pikepdf.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def cat(sources, pages, output):
+    """
+    Writes output document made of given pages.
+
+    sources is a dictionary handle -> path of source document,
+    pages is a list of (handle, page_num) tuples; page numbers start
+    with 1. Same semantics as
+
+        pdftk A=<path> B=<path> cat A1 B3 A2 output <output>
+    """
+    pdfs = {}
+    try:
+        for handle, path in sources.items():
+            pdfs[handle] = pikepdf.open(path)
+
+        if len(pdfs) == 1:
+            # pages of single source are rearranged in place, no
+            # objects need to be copied between documents
+            pdf = next(iter(pdfs.values()))
+            new_pages = [pdf.pages[page_num - 1] for _, page_num in pages]
+            # objects of dropped pages are not written to output
+            del pdf.pages[:]
+            pdf.pages.extend(new_pages)
+        else:
+            pdf = pikepdf.new()
+            for handle, page_num in pages:
+                pdf.pages.append(pdfs[handle].pages[page_num - 1])
+
+        dirname = os.path.dirname(output)
+        os.makedirs(dirname, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=dirname, suffix='.pdf', delete=False
+        ) as tmpfile:
+            pass
+        try:
+            pdf.save(tmpfile.name)
+        except BaseException:
+            os.remove(tmpfile.name)
+            raise
+        os.replace(tmpfile.name, output)
+    finally:
+        for src in pdfs.values():
+            src.close()
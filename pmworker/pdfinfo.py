@@ -2,15 +2,57 @@ import os
 import re
 import subprocess
 import logging
+from functools import lru_cache
+
+from pmworker.utils import file_version
+from pmworker import pdfengine
 
 """
-Uses command line pdfinfo utility (from poppler pakage) for various
-small operations (e.g. get pdf page count).
+Reads page count in process with pikepdf. Falls back to command line
+pdfinfo utility (from poppler pakage) for files which cannot be read
+that way (e.g. broken or encrypted PDFs) or if pikepdf is not installed.
 """
 
 logger = logging.getLogger(__name__)
 
 
+class PDFStructureError(Exception):
+    pass
+
+
+def read_pagecount(filepath):
+    """
+    Returns number of pages of PDF document read with pikepdf.
+
+    Raises PDFStructureError if document cannot be read (or pikepdf
+    is not installed).
+    """
+    if not pdfengine.is_available():
+        raise PDFStructureError("pikepdf is not installed")
+
+    try:
+        return pdfengine.get_pagecount(filepath)
+    except pdfengine.PdfError as e:
+        raise PDFStructureError(str(e))
+
+
+@lru_cache(maxsize=1024)
+def _get_pdf_pagecount(filepath, size, mtime):
+    """
+    size and mtime are part of cache key only; they make
+    sure that cached value is discarded when file changes.
+    """
+    try:
+        return read_pagecount(filepath)
+    except PDFStructureError as e:
+        logger.info(
+            f"get_pagecount: falling back to pdfinfo for"
+            f" {filepath}: {e}"
+        )
+
+    return _pdfinfo_pagecount(filepath)
+
+
 def get_pagecount(filepath):
     """
     Returns the number of pages in a PDF document as integer.
@@ -37,6 +79,13 @@ def get_pagecount(filepath):
             " method"
         )
 
+    return _get_pdf_pagecount(
+        str(filepath),
+        *file_version(filepath)
+    )
+
+
+def _pdfinfo_pagecount(filepath):
     # pdfinfo "${PDFFILE}" | grep Pages
 
     cmd = ["/usr/bin/pdfinfo", filepath]
@@ -63,7 +112,7 @@ def get_pagecount(filepath):
     lines = compl.stdout.decode('utf-8').split('\n')
     # look up for the line containing "Pages: 11"
     for line in lines:
-        x = re.match("Pages:\W+(\d+)$", line.strip())
+        x = re.match(r"Pages:\W+(\d+)$", line.strip())
         if x:
             return int(x.group(1))
 
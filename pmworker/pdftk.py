@@ -1,11 +1,18 @@
 import os
+import copy
 import logging
+import tempfile
 
 from pmworker.runcmd import run
 from pmworker.pdfinfo import get_pagecount
+from pmworker.ocrmigrate import migrate_pages
+from pmworker import pdfengine
 
 logger = logging.getLogger(__name__)
 
+# POSIX minimum
+DEFAULT_ARG_MAX = 4096
+
 #
 #  Utilities around pdftk command line tool
 #
@@ -78,18 +85,90 @@ def cat_ranges_for_delete(page_count, page_numbers):
 
     page_numbers is a list of page numbers (starting with 1).
     """
-    results = []
-
     for check in page_numbers:
         if not isinstance(check, int):
             err_msg = "page_numbers must be a list of strings"
             raise ValueError(err_msg)
 
-    for number in range(1, page_count + 1):
-        if number not in page_numbers:
-            results.append(number)
+    deleted = set(page_numbers)
+
+    return [
+        number for number in range(1, page_count + 1)
+        if number not in deleted
+    ]
+
+
+def get_handle(index):
+    """
+    Returns pdftk handle (one or more upper-case letters) of
+    index-th (starting with 0) input document:
+
+        0 -> A, 1 -> B, ..., 25 -> Z, 26 -> AA, 27 -> AB, ..., 701 -> ZZ,
+        702 -> AAA, ...
+
+    Thus number of input documents is not limited to 26.
+    """
+    handle = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        handle = chr(ord('A') + remainder) + handle
+
+    return handle
+
+
+def page_ranges(pages):
+    """
+    Groups consecutive pages of the same source.
+
+    pages is a list of (handle, page_num) tuples; returns a list
+    of (handle, first_page, last_page) tuples e.g.
+
+        [('A', 1), ('A', 2), ('A', 3), ('B', 7), ('A', 5)]
+
+    results in
+
+        [('A', 1, 3), ('B', 7, 7), ('A', 5, 5)]
+    """
+    ranges = []
+    for handle, page_num in pages:
+        if ranges:
+            last_handle, first, last = ranges[-1]
+            if last_handle == handle and page_num == last + 1:
+                ranges[-1] = (handle, first, page_num)
+                continue
+        ranges.append((handle, page_num, page_num))
+
+    return ranges
 
-    return results
+
+def page_spec(handle, first, last, page_count=None):
+    """
+    Returns pdftk page range e.g. A3, A1-500 or A501-end.
+    """
+    if first == last:
+        return f"{handle}{first}"
+    if last == page_count:
+        return f"{handle}{first}-end"
+
+    return f"{handle}{first}-{last}"
+
+
+def get_max_cmd_length():
+    """
+    Max length of command line (arguments plus environment must fit
+    into ARG_MAX); half of ARG_MAX is left for the environment.
+    """
+    try:
+        arg_max = os.sysconf('SC_ARG_MAX')
+    except (ValueError, OSError, AttributeError):
+        arg_max = DEFAULT_ARG_MAX
+
+    return arg_max // 2
+
+
+def cmd_length(cmd):
+    return sum(len(arg) + 1 for arg in cmd)
 
 
 def make_sure_path_exists(filepath):
@@ -101,6 +180,141 @@ def make_sure_path_exists(filepath):
     )
 
 
+def cat(sources, pages, output):
+    """
+    sources is a dictionary handle -> path of source document
+    e.g. {'A': '/path/doc1.pdf', 'B': '/path/doc2.pdf'}, pages is a
+    list of (handle, page_num) e.g. [('A', 1), ('B', 3), ('A', 2)].
+
+    Writes output document made of given pages, same as:
+
+        pdftk A=/path/doc1.pdf B=/path/doc2.pdf cat A1 B3 A2 output <output>
+
+    Pages are copied in process (pdfengine) if pikepdf is available,
+    otherwise pdftk is run.
+    """
+    make_sure_path_exists(output)
+
+    if pdfengine.use_pikepdf():
+        pdfengine.cat(sources, pages, output)
+        return
+
+    # consecutive pages are passed as ranges e.g. A1-500 B3-9 A501-end
+    page_counts = {
+        handle: get_pagecount(path) for handle, path in sources.items()
+    }
+    specs = [
+        (handle, page_spec(handle, first, last, page_counts[handle]))
+        for handle, first, last in page_ranges(pages)
+    ]
+    cmd = get_cat_cmd(sources, [spec for _, spec in specs], output)
+
+    if cmd_length(cmd) <= get_max_cmd_length():
+        run(cmd)
+        return
+
+    cat_chunked(sources, specs, output)
+
+
+def get_cat_cmd(sources, specs, output):
+    cmd = [
+        "pdftk",
+    ]
+    # add A=doc1_path, B=doc2_path
+    for handle, path in sources.items():
+        cmd.append(f"{handle}={path}")
+
+    cmd.append("cat")
+    cmd.extend(specs)
+    cmd.append("output")
+    cmd.append(output)
+
+    return cmd
+
+
+def cat_chunked(sources, specs, output):
+    """
+    pdftk can't read its arguments from a file; if command line would
+    be too long, output is assembled from several parts, each written
+    by a separate pdftk run, which are then concatenated (in turn
+    chunked, if there are too many parts).
+
+    specs is a list of (handle, page spec) tuples; command of each part
+    lists only sources its specs refer to.
+    """
+    max_length = get_max_cmd_length()
+
+    with tempfile.TemporaryDirectory(
+        dir=os.path.dirname(output)
+    ) as tmp_dirname:
+        part_template = os.path.join(tmp_dirname, "part-{}.pdf")
+        # index of any part is at most number of specs
+        base_length = cmd_length(
+            get_cat_cmd({}, [], part_template.format(len(specs)))
+        )
+        chunks = [[]]
+        length = base_length
+        handles = set()
+        for handle, spec in specs:
+            spec_length = len(spec) + 1
+            source_length = len(f"{handle}={sources[handle]}") + 1
+            if base_length + spec_length + source_length > max_length:
+                raise ValueError(
+                    f"pdftk command line for {sources[handle]} exceeds"
+                    f" {max_length} characters"
+                )
+            if handle not in handles:
+                spec_length += source_length
+            if chunks[-1] and length + spec_length > max_length:
+                chunks.append([])
+                length = base_length
+                handles = set()
+                spec_length = len(spec) + 1 + source_length
+            chunks[-1].append((handle, spec))
+            handles.add(handle)
+            length += spec_length
+
+        logger.debug(
+            f"Command line too long, cat {output} in {len(chunks)} parts"
+        )
+        parts = []
+        for idx, chunk in enumerate(chunks):
+            part = part_template.format(idx)
+            chunk_sources = {
+                handle: sources[handle] for handle, _ in chunk
+            }
+            run(
+                get_cat_cmd(
+                    chunk_sources, [spec for _, spec in chunk], part
+                )
+            )
+            parts.append(part)
+
+        if len(parts) == 1:
+            os.replace(parts[0], output)
+            return
+
+        # spec made of handle only stands for all pages of the document
+        part_sources = {
+            get_handle(idx): part for idx, part in enumerate(parts)
+        }
+        cmd = get_cat_cmd(part_sources, list(part_sources), output)
+        if cmd_length(cmd) <= max_length:
+            run(cmd)
+        elif len(parts) >= len(specs):
+            # each command fits single spec only, parts won't get fewer
+            raise ValueError(
+                f"pdftk command line for {output} can't be split"
+                f" into parts shorter than {max_length} characters"
+            )
+        else:
+            cat_chunked(
+                part_sources,
+                [(handle, handle) for handle in part_sources],
+                output
+            )
+
+
 def split_ranges(total, after=False, before=False):
     """
     Given a range 1, 2, ..., total (page numbers of a doc).
@@ -147,75 +361,56 @@ def paste_pages_into_existing_doc(
     dest_doc_ep,
     src_doc_ep_list,
     after_page_number=False,
-    before_page_number=False
+    before_page_number=False,
+    migrate_ocr=False,
+    s3_migrate=False
 ):
     page_count = get_pagecount(dest_doc_ep.url())
+    old_dest_doc_ep = copy.copy(dest_doc_ep)
     list1, list2 = split_ranges(
         total=page_count,
         after=after_page_number,
         before=before_page_number
     )
-    # notice missing A
-    # Letter A is assignent to current folder and
-    # pages from list1 and list2
-    letters = "BCDEFGHIJKLMNOPQRSTUVWXYZ"
-    letters_2_doc_map = []
-    letters_pages = []
-    letters_pages_before = []
-    letters_pages_after = []
+    # Handle A is assigned to current document and
+    # pages from list1 and list2; pasted pages start with B
+    sources = {'A': dest_doc_ep.url()}
+    inserted_pages = []
 
-    letters_2_doc_map.append(
-        f"A={dest_doc_ep.url()}"
-    )
+    # (doc_ep, page_num) for each of inserted pages
+    inserted_page_sources = []
 
     for idx in range(0, len(src_doc_ep_list)):
-        letter = letters[idx]
+        letter = get_handle(idx + 1)
         doc_ep = src_doc_ep_list[idx]['doc_ep']
         pages = src_doc_ep_list[idx]['page_nums']
 
-        letters_2_doc_map.append(
-            f"{letter}={doc_ep.url()}"
-        )
+        sources[letter] = doc_ep.url()
         for p in pages:
-            letters_pages.append(
-                f"{letter}{p}"
-            )
+            inserted_pages.append((letter, p))
+            inserted_page_sources.append((doc_ep, p))
 
     dest_doc_ep.inc_version()
 
-    for p in list1:
-        letters_pages_before.append(
-            f"A{p}"
-        )
+    cat(
+        sources,
+        # existing doc pages (may be empty), newly inserted pages,
+        # existing doc pages (may be empty)
+        [('A', p) for p in list1] +
+        inserted_pages +
+        [('A', p) for p in list2],
+        dest_doc_ep.url()
+    )
 
-    for p in list2:
-        letters_pages_after.append(
-            f"A{p}"
+    if migrate_ocr:
+        migrate_pages(
+            dest_doc_ep,
+            [(old_dest_doc_ep, p) for p in list1] +
+            inserted_page_sources +
+            [(old_dest_doc_ep, p) for p in list2],
+            s3=s3_migrate
         )
 
-    cmd = [
-        "pdftk",
-    ]
-    # add A=doc1_path, B=doc2_path
-    cmd.extend(letters_2_doc_map)
-
-    cmd.append("cat")
-
-    # existing doc pages (may be empty)
-    cmd.extend(letters_pages_before)
-    # newly inserted pages
-    cmd.extend(letters_pages)
-    # existing doc pages (may be empty)
-    cmd.extend(letters_pages_after)
-
-    cmd.append("output")
-
-    make_sure_path_exists(dest_doc_ep.url())
-
-    cmd.append(dest_doc_ep.url())
-
-    run(cmd)
-
     return dest_doc_ep.version
 
 
@@ -224,7 +419,9 @@ def paste_pages(
     src_doc_ep_list,
     dest_doc_is_new=True,
     after_page_number=False,
-    before_page_number=False
+    before_page_number=False,
+    migrate_ocr=False,
+    s3_migrate=False
 ):
     """
     dest_doc_ep = endpoint of the doc where newly created
@@ -242,7 +439,8 @@ def paste_pages(
             ...
         ]
     src_doc_ep_list is a list of documents where pages
-    (with numbers page_num_1...) will be paste from.
+    (with numbers page_num_1...) will be paste from. There is no
+    limit on number of documents, output is written once.
 
     dest_doc_is_new = True well.. destination document was just created,
     we are pasting here cutted pages into some folder as new document.
@@ -259,55 +457,46 @@ def paste_pages(
 
     If both before_page_number and after_page_number are < 0 - just paste
     pages at the end of the document.
+
+    With migrate_ocr=True, OCR artifacts of pasted pages are copied
+    into the new document version, so there is no need to OCR
+    it again; with s3_migrate=True they are copied in S3 as well.
     """
     if not dest_doc_is_new:
         return paste_pages_into_existing_doc(
             dest_doc_ep=dest_doc_ep,
             src_doc_ep_list=src_doc_ep_list,
             after_page_number=after_page_number,
-            before_page_number=before_page_number
+            before_page_number=before_page_number,
+            migrate_ocr=migrate_ocr,
+            s3_migrate=s3_migrate
         )
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    letters_2_doc_map = []
+    sources = {}
     letters_pages = []
+    # (doc_ep, page_num) for each page of the new document
+    page_sources = []
 
     for idx in range(0, len(src_doc_ep_list)):
-        letter = letters[idx]
+        letter = get_handle(idx)
         doc_ep = src_doc_ep_list[idx]['doc_ep']
         pages = src_doc_ep_list[idx]['page_nums']
 
-        letters_2_doc_map.append(
-            f"{letter}={doc_ep.url()}"
-        )
+        sources[letter] = doc_ep.url()
         for p in pages:
-            letters_pages.append(
-                f"{letter}{p}"
-            )
+            letters_pages.append((letter, p))
+            page_sources.append((doc_ep, p))
 
     dest_doc_ep.inc_version()
 
-    cmd = [
-        "pdftk",
-    ]
-    # add A=doc1_path, B=doc2_path
-    cmd.extend(letters_2_doc_map)
-
-    cmd.append("cat")
-
-    cmd.extend(letters_pages)
-
-    cmd.append("output")
+    cat(sources, letters_pages, dest_doc_ep.url())
 
-    make_sure_path_exists(dest_doc_ep.url())
-
-    cmd.append(dest_doc_ep.url())
-
-    run(cmd)
+    if migrate_ocr:
+        migrate_pages(dest_doc_ep, page_sources, s3=s3_migrate)
 
     return dest_doc_ep.version
 
 
-def reorder_pages(doc_ep, new_order):
+def reorder_pages(doc_ep, new_order, migrate_ocr=False, s3_migrate=False):
     """
     new_order is a list of following format:
 
@@ -323,9 +512,14 @@ def reorder_pages(doc_ep, new_order):
     page_order  = current page order
     So in human language, each hash is read:
         <page_num> now should be <page_order>
+
+    With migrate_ocr=True, OCR artifacts of all pages are copied
+    into the new document version, so there is no need to OCR
+    it again; with s3_migrate=True they are copied in S3 as well.
     """
     ep_url = doc_ep.url()
     page_count = get_pagecount(ep_url)
+    old_doc_ep = copy.copy(doc_ep)
 
     cat_ranges = cat_ranges_for_reorder(
         page_count=page_count,
@@ -334,27 +528,33 @@ def reorder_pages(doc_ep, new_order):
 
     doc_ep.inc_version()
 
-    cmd = [
-        "pdftk",
-        ep_url,
-        "cat"
-    ]
-    for page in cat_ranges:
-        cmd.append(
-            str(page)
-        )
+    cat(
+        {'A': ep_url},
+        [('A', page) for page in cat_ranges],
+        doc_ep.url()
+    )
 
-    cmd.append("output")
-    make_sure_path_exists(doc_ep.url())
-    cmd.append(doc_ep.url())
-    run(cmd)
+    if migrate_ocr:
+        migrate_pages(
+            doc_ep,
+            [(old_doc_ep, page) for page in cat_ranges],
+            s3=s3_migrate
+        )
 
     return doc_ep.version
 
 
-def delete_pages(doc_ep, page_numbers):
+def delete_pages(doc_ep, page_numbers, migrate_ocr=False, s3_migrate=False):
+    """
+    Deletes pages with given page_numbers (list of integers).
+
+    With migrate_ocr=True, OCR artifacts of remaining pages are copied
+    into the new document version; with s3_migrate=True they
+    are copied in S3 as well.
+    """
     ep_url = doc_ep.url()
     page_count = get_pagecount(ep_url)
+    old_doc_ep = copy.copy(doc_ep)
 
     cat_ranges = cat_ranges_for_delete(
         page_count,
@@ -363,20 +563,17 @@ def delete_pages(doc_ep, page_numbers):
 
     doc_ep.inc_version()
 
-    cmd = [
-        "pdftk",
-        ep_url,
-        "cat"
-    ]
-    for page in cat_ranges:
-        cmd.append(
-            str(page)
-        )
-
-    cmd.append("output")
-    make_sure_path_exists(doc_ep.url())
-    cmd.append(doc_ep.url())
+    cat(
+        {'A': ep_url},
+        [('A', page) for page in cat_ranges],
+        doc_ep.url()
+    )
 
-    run(cmd)
+    if migrate_ocr:
+        migrate_pages(
+            doc_ep,
+            [(old_doc_ep, page) for page in cat_ranges],
+            s3=s3_migrate
+        )
 
     return doc_ep.version
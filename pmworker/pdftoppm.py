@@ -0,0 +1,78 @@
+import os
+import re
+import logging
+from pmworker import wrapper
+
+logger = logging.getLogger(__name__)
+
+
+class Pdftoppm(wrapper.Wrapper):
+    """
+    Wrapper around pdftoppm utility (from poppler package).
+
+    Renders a range of pages with one single invocation, thus
+    PDF document is opened and parsed only once.
+    """
+
+    def __init__(self, dry_run=False):
+        super().__init__(exec_name="pdftoppm", dry_run=dry_run)
+
+    def get_cmd_jpeg(
+        self,
+        filepath,
+        first_page,
+        last_page,
+        width,
+        output_root
+    ):
+        cmd = self.get_cmd()
+
+        cmd.extend(['-jpeg'])
+        cmd.extend(['-f', str(first_page)])
+        cmd.extend(['-l', str(last_page)])
+        cmd.extend(['-scale-to-x', str(width)])
+        # height is adjusted according to image ratio
+        cmd.extend(['-scale-to-y', '-1'])
+        cmd.extend([filepath, output_root])
+
+        return cmd
+
+    def __call__(
+        self,
+        filepath,
+        first_page,
+        last_page,
+        width,
+        output_root
+    ):
+        """
+        Returns a dictionary page_num -> path of rendered jpeg.
+
+        pdftoppm names output files <output_root>-<page_num>.jpg, with
+        page_num zero padded depending on document's page count.
+        """
+        cmd = self.get_cmd_jpeg(
+            filepath=filepath,
+            first_page=first_page,
+            last_page=last_page,
+            width=width,
+            output_root=output_root
+        )
+        result = self.run(cmd)
+
+        if result.returncode:
+            raise Exception(
+                "Error occured during pdftoppm: %s " % result.stderr
+            )
+
+        dirname = os.path.dirname(output_root)
+        pattern = re.compile(
+            re.escape(os.path.basename(output_root)) + r"-(\d+)\.jpg$"
+        )
+        images = {}
+        for name in os.listdir(dirname):
+            match = pattern.match(name)
+            if match:
+                images[int(match.group(1))] = os.path.join(dirname, name)
+
+        return images
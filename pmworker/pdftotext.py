@@ -0,0 +1,43 @@
+import logging
+from pmworker import wrapper
+
+logger = logging.getLogger(__name__)
+
+
+class Pdftotext(wrapper.Wrapper):
+    """
+    Wrapper around pdftotext utility (from poppler package).
+    """
+
+    def __init__(self, dry_run=False):
+        super().__init__(exec_name="pdftotext", dry_run=dry_run)
+
+    def get_cmd_bbox_layout(self, filepath, page_num):
+        cmd = self.get_cmd()
+
+        cmd.extend(['-f', str(page_num)])
+        cmd.extend(['-l', str(page_num)])
+        cmd.extend(['-bbox-layout'])
+        # write result to stdout
+        cmd.extend([filepath, '-'])
+
+        return cmd
+
+    def bbox_layout(self, filepath, page_num):
+        """
+        Returns XHTML (as string) with embedded text of given page
+        and bounding boxes (in PDF points) of its blocks, lines and
+        words.
+        """
+        cmd = self.get_cmd_bbox_layout(
+            filepath=filepath,
+            page_num=page_num
+        )
+        result = self.run(cmd)
+
+        if result.returncode:
+            raise Exception(
+                "Error occured during pdftotext: %s " % result.stderr
+            )
+
+        return result.stdout
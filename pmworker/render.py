@@ -0,0 +1,135 @@
+import os
+import copy
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from pmworker.step import (Step, Steps)
+from pmworker.pdftoppm import Pdftoppm
+
+"""
+Page rendering stage: rasterize PDF pages once and build the image
+for every Step in-process.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def largest_step():
+    return Step(
+        Step.LIST.index(max(Step.LIST))
+    )
+
+
+def build_img_pyramid(page_url):
+    """
+    Given page_url pointing to (already extracted) image of the
+    largest Step, creates images for all other Steps by successive
+    downscaling (125% -> 100% -> 75% -> 50% -> 10%).
+
+    Box filter is used for resizing, i.e. each destination pixel
+    is the average of source pixels it covers.
+    """
+    steps = sorted(
+        Steps(),
+        key=lambda step: step.width,
+        reverse=True
+    )
+    dst_url = copy.copy(page_url)
+
+    with Image.open(page_url.img_url()) as image:
+        image.load()
+        # heights are computed against original image to avoid
+        # accumulating rounding errors
+        orig_width, orig_height = image.size
+        for step in steps:
+            if step.width >= image.width:
+                continue
+
+            height = max(
+                1, int(round(orig_height * step.width / orig_width))
+            )
+            image = image.resize((step.width, height), Image.BOX)
+
+            dst_url.step = step
+            img_url = dst_url.img_url()
+            os.makedirs(os.path.dirname(img_url), exist_ok=True)
+            logger.debug(f"Saving {step} image to {img_url}")
+            image.save(img_url, 'JPEG')
+
+
+def render_pages(page_urls):
+    """
+    Rasterizes pages of one document, all with a single pdftoppm run,
+    at the largest Step.
+
+    page_urls is a list of PageEp instances of the same document.
+    Returns a list of PageEp instances (same order as page_urls)
+    with step set to the largest Step.
+    """
+    if not page_urls:
+        return []
+
+    doc_ep = page_urls[0].document_ep
+    doc_url = doc_ep.url()
+    page_nums = [page_url.page_num for page_url in page_urls]
+    top = largest_step()
+    top_urls = []
+
+    # rendered within MEDIA_ROOT, so that images are moved into place
+    # by rename instead of copying them from (another filesystem) /tmp
+    os.makedirs(doc_ep.pages_dirname, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=doc_ep.pages_dirname) as tmpdir:
+        images = Pdftoppm()(
+            filepath=doc_url,
+            first_page=min(page_nums),
+            last_page=max(page_nums),
+            width=top.width,
+            output_root=os.path.join(tmpdir, "page")
+        )
+        for page_url in page_urls:
+            top_url = copy.copy(page_url)
+            top_url.step = top
+            img_url = top_url.img_url()
+            os.makedirs(os.path.dirname(img_url), exist_ok=True)
+            shutil.move(images[page_url.page_num], img_url)
+            top_urls.append(top_url)
+
+    return top_urls
+
+
+def render_batches(page_urls, batch_size):
+    """
+    Renders pages (see render_pages) in batches of batch_size pages;
+    yields lists of PageEp instances of rendered batches.
+
+    Next batch is rendered (in background) while the caller processes
+    the current one, so that rendering overlaps with OCR and at most two
+    batches of not yet processed images exist at any time.
+    """
+    batches = [
+        page_urls[idx:idx + batch_size]
+        for idx in range(0, len(page_urls), batch_size)
+    ]
+    if not batches:
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(render_pages, batches[0])
+        for batch in batches[1:]:
+            top_urls = pending.result()
+            pending = executor.submit(render_pages, batch)
+            yield top_urls
+        yield pending.result()
+
+
+def render_page(page_url):
+    """
+    Rasterizes page_url's page once at the largest Step and
+    derives images for all other Steps from it.
+    """
+    for top_url in render_pages([page_url]):
+        build_img_pyramid(top_url)
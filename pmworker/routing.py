@@ -0,0 +1,100 @@
+import logging
+
+from kombu import Exchange, Queue
+
+"""
+Routing of tasks into separate queues, so that bulk work (imports,
+migrations, OCR of large documents split into chunks) doesn't delay
+interactive work (OCR of a single page or uploaded document user is
+waiting for) and maintenance (garbage collection) runs only when
+nothing else is waiting.
+
+Each task carries a priority hint (message priority, higher number is
+more urgent, RabbitMQ semantics) derived from its queue unless given
+explicitly e.g. ocr_page.apply_async(..., priority=9).
+
+Configured in pmworker.config by:
+
+    task_queues = get_task_queues()
+    task_routes = (route_task,)
+"""
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+MAINTENANCE = 'maintenance'
+
+QUEUES = (INTERACTIVE, BULK, MAINTENANCE)
+
+MAX_PRIORITY = 9
+
+QUEUE_PRIORITIES = {
+    INTERACTIVE: 6,
+    BULK: 3,
+    MAINTENANCE: 0
+}
+
+# task name -> (queue, priority)
+TASK_ROUTES = {
+    # user waits for a single page (upload, re-OCR of one page)
+    'pmworker.tasks.ocr_page': (INTERACTIVE, MAX_PRIORITY),
+    'pmworker.tasks.ocr_document': (
+        INTERACTIVE, QUEUE_PRIORITIES[INTERACTIVE]
+    ),
+    # chunks of split documents are dispatched into bulk queue too
+    'pmworker.tasks.ocr_document_split': (BULK, QUEUE_PRIORITIES[BULK]),
+    'pmworker.tasks.ocr_document_summary': (BULK, QUEUE_PRIORITIES[BULK]),
+    'pmworker.tasks.ocr_document_split_failed': (
+        BULK, QUEUE_PRIORITIES[BULK]
+    ),
+    'pmworker.tasks.gc_document_versions': (
+        MAINTENANCE, QUEUE_PRIORITIES[MAINTENANCE]
+    ),
+}
+
+
+def get_task_queues(exchange_name='papermerge'):
+    """
+    Returns interactive, bulk and maintenance queues (bound to direct
+    exchange_name exchange) with message priorities enabled.
+    """
+    exchange = Exchange(exchange_name, type='direct')
+
+    return [
+        Queue(
+            name,
+            exchange,
+            routing_key=name,
+            queue_arguments={'x-max-priority': MAX_PRIORITY}
+        )
+        for name in QUEUES
+    ]
+
+
+def get_queue_name(queue):
+    """
+    Returns name of the queue given either as name or as kombu Queue.
+    """
+    return getattr(queue, 'name', queue)
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (task_routes setting). Returns queue and priority
+    of the task; both can be overridden per call via apply_async
+    (or signature.set) options. Task sent explicitly to another queue
+    gets that queue's priority.
+    """
+    if name not in TASK_ROUTES:
+        return None
+
+    queue, priority = TASK_ROUTES[name]
+    if options.get('queue'):
+        queue = get_queue_name(options['queue'])
+        priority = QUEUE_PRIORITIES.get(queue, priority)
+
+    return {
+        'queue': queue,
+        'priority': priority
+    }
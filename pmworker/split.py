@@ -0,0 +1,170 @@
+import os
+import json
+import math
+import logging
+
+from pmworker.settings import get_settings
+from pmworker.storage import get_backend
+
+"""
+Splitting of large documents into page range chunks, OCRed by separate
+ocr_document tasks (spread across all workers), and aggregation of
+their results into per document summary.
+
+Chunk size is chosen by estimated OCR cost: pages of large (per page)
+files, i.e. scans, are assumed to be more expensive than pages of
+small, mostly text/vector, files.
+"""
+
+logger = logging.getLogger(__name__)
+
+# estimated OCR time of an average (REFERENCE_PAGE_BYTES) page
+DEFAULT_SECONDS_PER_PAGE = 3.0
+# size of a typical 300 DPI scanned A4 page
+REFERENCE_PAGE_BYTES = 200 * 1024
+# target run time of one chunk
+DEFAULT_CHUNK_SECONDS = 300
+DEFAULT_MIN_CHUNK_PAGES = 10
+DEFAULT_MAX_CHUNKS = 64
+
+SUMMARY_NAME = "ocr_summary.json"
+
+
+def estimate_page_cost(page_count, file_size, seconds_per_page=None):
+    """
+    Returns estimated OCR time (in seconds) of one page of a document.
+    """
+    if seconds_per_page is None:
+        seconds_per_page = getattr(
+            get_settings(),
+            'ocr_seconds_per_page',
+            DEFAULT_SECONDS_PER_PAGE
+        )
+    page_bytes = file_size / max(page_count, 1)
+    # text only pages are still rendered and OCRed, scans with
+    # many details take longer, but not proportionally
+    factor = min(max(page_bytes / REFERENCE_PAGE_BYTES, 0.5), 4)
+
+    return seconds_per_page * factor
+
+
+def get_chunks(
+    page_count,
+    page_cost,
+    chunk_seconds=DEFAULT_CHUNK_SECONDS,
+    min_pages=DEFAULT_MIN_CHUNK_PAGES,
+    max_chunks=DEFAULT_MAX_CHUNKS
+):
+    """
+    Returns a list of (first_page, last_page) chunks covering pages
+    1..page_count. Each chunk takes about chunk_seconds (but has at
+    least min_pages); there are at most max_chunks chunks. Pages are
+    distributed evenly i.e. chunk sizes differ by one page at most.
+    """
+    if page_count < 1:
+        return []
+
+    chunk_pages = max(int(chunk_seconds / page_cost), min_pages, 1)
+    chunk_count = min(math.ceil(page_count / chunk_pages), max_chunks)
+    chunk_count = max(chunk_count, 1)
+
+    base, extra = divmod(page_count, chunk_count)
+    chunks = []
+    first_page = 1
+    for idx in range(chunk_count):
+        size = base + (1 if idx < extra else 0)
+        chunks.append((first_page, first_page + size - 1))
+        first_page += size
+
+    return chunks
+
+
+def get_document_chunks(page_count, file_size):
+    """
+    get_chunks with parameters taken from settings:
+
+        * ocr_seconds_per_page - estimated OCR time of an average page
+        * split_chunk_seconds - target run time of one chunk
+        * split_min_chunk_pages - min number of pages of a chunk
+        * split_max_chunks - max number of chunks of one document
+    """
+    settings = get_settings()
+
+    return get_chunks(
+        page_count,
+        page_cost=estimate_page_cost(page_count, file_size),
+        chunk_seconds=getattr(
+            settings, 'split_chunk_seconds', DEFAULT_CHUNK_SECONDS
+        ),
+        min_pages=getattr(
+            settings, 'split_min_chunk_pages', DEFAULT_MIN_CHUNK_PAGES
+        ),
+        max_chunks=getattr(
+            settings, 'split_max_chunks', DEFAULT_MAX_CHUNKS
+        )
+    )
+
+
+def summarize(chunk_results, page_count, started_at, finished_at):
+    """
+    Aggregates results of chunk (ocr_document) tasks - lists of per page
+    results - into per document summary.
+    """
+    pages = sorted(
+        (result for results in chunk_results for result in results),
+        key=lambda result: result['page_num']
+    )
+    ocr_times = [
+        page['ocr_time'] for page in pages
+        if page.get('ocr_time') is not None
+    ]
+
+    return {
+        'page_count': page_count,
+        'pages_processed': len(pages),
+        'chunks': len(chunk_results),
+        'blank_pages': [page['page_num'] for page in pages if page['blank']],
+        'failed_pages': [
+            {'page_num': page['page_num'], 'error': page['error']}
+            for page in pages if 'error' in page
+        ],
+        'ocr_time': round(sum(ocr_times), 2),
+        'max_page_ocr_time': max(ocr_times, default=0),
+        'total_time': round(finished_at - started_at, 2)
+    }
+
+
+def failed_summary(error, page_count, started_at, finished_at):
+    """
+    Summary of a document whose chunk failed as a whole (e.g. worker was
+    lost); results of pages are unknown, all of them are marked failed.
+    """
+    summary = summarize(
+        [], page_count=page_count,
+        started_at=started_at, finished_at=finished_at
+    )
+    summary['error'] = error
+    summary['failed_pages'] = [
+        {'page_num': page_num, 'error': error}
+        for page_num in range(1, page_count + 1)
+    ]
+
+    return summary
+
+
+def write_summary(pages_dirname, summary, remote_pages_dirname=None):
+    """
+    Writes summary as ocr_summary.json into (local) pages directory of
+    the document and uploads it to remote_pages_dirname (if given).
+    """
+    path = os.path.join(pages_dirname, SUMMARY_NAME)
+    data = json.dumps(summary, indent=2).encode('utf-8')
+    os.makedirs(pages_dirname, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    if remote_pages_dirname:
+        url = f"{remote_pages_dirname.rstrip('/')}/{SUMMARY_NAME}"
+        get_backend(url).put_bytes(data, url)
+
+    return path
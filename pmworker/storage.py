@@ -1,166 +1,783 @@
+import io
 import os
 import pwd
+import codecs
+import hashlib
 import grp
 from pathlib import Path
 import shutil
 import boto3
 import botocore
+import botocore.config
+import botocore.exceptions
 import tempfile
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from pmworker.endpoint import (
     Endpoint,
     get_keyname,
-    get_bucketname,
-    s3_key_exists
+    get_bucketname
 )
+from pmworker.settings import get_settings
+from pmworker import compression
+from pmworker.exceptions import DeleteError
 
 BASE_DIR = Path(__file__).parent.parent
 logger = logging.getLogger(__name__)
 
+# same as botocore's default
+DEFAULT_S3_MAX_POOL_CONNECTIONS = 10
+MB = 1024 * 1024
+# ranged (parallel) downloads
+DEFAULT_DOWNLOAD_PART_SIZE = 8 * MB
+DEFAULT_DOWNLOAD_THRESHOLD = 64 * MB
+# size of chunks in which text content is streamed from S3
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
-def upload_txt(page_url):
-    s3_url = page_url.txt_url(ep=Endpoint.S3)
-    txt_url = page_url.txt_url()
-    bucketname = get_bucketname(s3_url)
-    keyname = get_keyname(s3_url)
-    s3_client = boto3.client('s3')
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_pool_size():
+    """
+    Max number of connections kept open by S3 client
+    (s3_max_pool_connections setting).
+    """
+    return getattr(
+        get_settings(),
+        's3_max_pool_connections',
+        DEFAULT_S3_MAX_POOL_CONNECTIONS
+    )
 
+
+def get_s3_client():
+    """
+    Returns S3 client shared by all storage calls of current process.
+
+    Client is created lazily (endpoint data is parsed and connection
+    pool is set up only once). Connections must not be shared across
+    processes, thus a forked process (e.g. celery pool child) creates
+    a client of its own.
+
+    Settings:
+        * s3_max_pool_connections - size of the connection pool (i.e.
+          number of threads which can use the client concurrently
+          without waiting for a connection)
+        * s3_tcp_keepalive - enables TCP keep-alive on pooled connections
+        * s3_endpoint_url - url of S3 compatible service (e.g. minio),
+          None for AWS S3
+    """
+    global _s3_client, _s3_client_pid
+
+    with _s3_client_lock:
+        if _s3_client is None or _s3_client_pid != os.getpid():
+            settings = get_settings()
+            config_kwargs = {
+                'max_pool_connections': get_s3_pool_size()
+            }
+            if getattr(settings, 's3_tcp_keepalive', False):
+                config_kwargs['tcp_keepalive'] = True
+            # boto3 default session must not be shared between
+            # threads, client gets a session of its own
+            _s3_client = boto3.session.Session().client(
+                's3',
+                endpoint_url=getattr(settings, 's3_endpoint_url', None),
+                config=botocore.config.Config(**config_kwargs)
+            )
+            _s3_client_pid = os.getpid()
+
+    return _s3_client
+
+
+def upload_text_artifact(local_url, remote_url):
+    """
+    Uploads txt or hocr file; compressed if artifact_compression
+    setting is on.
+    """
+    encoding = compression.get_encoding()
+    if not encoding:
+        logger.debug(f"Uploading {local_url} to {remote_url}.")
+        get_backend(remote_url).put(local_url, remote_url)
+        return
+
+    with open(local_url, 'rb') as f:
+        data = f.read()
+    compressed = compression.compress(data, encoding)
     logger.debug(
-        f"Uploading to bucket={bucketname} "
-        f"Keyname={keyname} "
-        f"txt_url={txt_url} "
-        f"s3_url={s3_url}."
+        f"Uploading {local_url} to {remote_url}"
+        f" encoding={encoding} size={len(data)}"
+        f" compressed_size={len(compressed)}."
     )
-    s3_client.upload_file(
+    get_backend(remote_url).put_bytes(
+        compressed,
+        remote_url,
+        content_encoding=encoding
+    )
+
+
+def upload_txt(page_url):
+    upload_text_artifact(
         page_url.txt_url(),
-        bucketname,
-        keyname
+        page_url.txt_url(ep=Endpoint.S3)
     )
 
 
 def upload_hocr(page_url):
-    s3_url = page_url.hocr_url(ep=Endpoint.S3)
-    hocr_url = page_url.hocr_url()
-    bucketname = get_bucketname(s3_url)
-    keyname = get_keyname(s3_url)
-    s3_client = boto3.client('s3')
-
-    logger.debug(
-        f"Uploading to bucket={bucketname} "
-        f"Keyname={keyname} "
-        f"hocr_url={hocr_url} "
-        f"s3_url={s3_url}."
-    )
-    s3_client.upload_file(
-        hocr_url,
-        bucketname,
-        keyname
+    upload_text_artifact(
+        page_url.hocr_url(),
+        page_url.hocr_url(ep=Endpoint.S3)
     )
 
 
 def upload_img(page_url):
-    s3_url = page_url.img_url(ep=Endpoint.S3)
+    remote_url = page_url.img_url(ep=Endpoint.S3)
     img_url = page_url.img_url()
-    bucketname = get_bucketname(s3_url)
-    keyname = get_keyname(s3_url)
-    s3_client = boto3.client('s3')
 
     logger.debug(
-        f"Uploading to bucket={bucketname} "
-        f"Keyname={keyname} "
-        f"img_url={img_url} "
-        f"s3_url={s3_url}."
-    )
-    s3_client.upload_file(
-        img_url,
-        bucketname,
-        keyname
+        f"Uploading img_url={img_url} to {remote_url}."
     )
+    get_backend(remote_url).put(img_url, remote_url)
 
 
 def upload_document_to_s3(doc_ep):
-    s3_url = doc_ep.url(ep=Endpoint.S3)
+    remote_url = doc_ep.url(ep=Endpoint.S3)
     local_url = doc_ep.url()
-    bucketname = get_bucketname(s3_url)
-    keyname = get_keyname(s3_url)
-    s3_client = boto3.client('s3')
 
     if not os.path.exists(local_url):
         raise ValueError(f"{local_url} path does not exits")
 
     logger.debug(
-        f"upload_document {local_url} to s3:/{bucketname}{keyname}"
+        f"upload_document {local_url} to {remote_url}"
     )
+    get_backend(remote_url).put(local_url, remote_url)
+
+
+def get_download_config():
+    """
+    Returns (part_size, concurrency, threshold) used for downloads:
 
-    s3_client.upload_file(
-        local_url,
-        bucketname,
-        keyname
+        * s3_download_part_size - size of ranged GET requests
+        * s3_download_concurrency - number of parts downloaded at once
+          (defaults to size of S3 connection pool)
+        * s3_download_threshold - objects at least that large are
+          downloaded in parallel parts
+    """
+    settings = get_settings()
+    part_size = getattr(
+        settings, 's3_download_part_size', DEFAULT_DOWNLOAD_PART_SIZE
+    )
+    concurrency = getattr(
+        settings, 's3_download_concurrency', None
+    ) or get_s3_pool_size()
+    threshold = getattr(
+        settings, 's3_download_threshold', DEFAULT_DOWNLOAD_THRESHOLD
     )
 
+    return part_size, concurrency, threshold
 
-def download_hocr(page_ep):
 
-    if page_ep.hocr_exists():
-        return True
+def _write_body(fd, body, offset):
+    """
+    Writes streaming body to file descriptor fd starting at offset.
+    Returns offset of the end of written data.
+    """
+    for chunk in body.iter_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+        view = memoryview(chunk)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    return offset
+
+
+def _download_range(bucketname, keyname, etag, fd, start, end):
+    # IfMatch guarantees all parts are of the same object version
+    response = get_s3_client().get_object(
+        Bucket=bucketname,
+        Key=keyname,
+        Range=f"bytes={start}-{end}",
+        IfMatch=etag
+    )
+    _write_body(fd, response['Body'], start)
 
-    remote_abspath = page_ep.hocr_url(ep=Endpoint.S3)
-    local_abspath = page_ep.hocr_url()
-    local_dirname = os.path.dirname(local_abspath)
 
-    if not os.path.exists(
-        os.path.dirname(local_abspath)
-    ):
-        logger.debug(f"{local_dirname} does not exists. Creating.")
-        os.makedirs(
-            local_dirname, exist_ok=True
-        )
-    else:
-        logger.debug(f"{local_dirname} already exists.")
+def _get_ranges(total, part_size, threshold):
+    """
+    Ranges (start, end) to download after first part_size bytes
+    were received. Below threshold the rest is fetched with one request.
+    """
+    if total <= part_size:
+        return []
+    if total < threshold:
+        return [(part_size, total - 1)]
+
+    return [
+        (start, min(start + part_size, total) - 1)
+        for start in range(part_size, total, part_size)
+    ]
+
+
+def get_object_to_file(
+    bucketname,
+    keyname,
+    local_abspath,
+    etag=None,
+    part_size=None,
+    concurrency=None,
+    threshold=None
+):
+    """
+    Downloads s3:/bucketname/keyname to local_abspath.
 
-    s3_client = boto3.client('s3')
+    First part_size bytes are requested with a ranged GET; this request
+    also tells object's size. Small objects are thus fetched with a
+    single request, objects larger than threshold are fetched with
+    concurrent ranged GETs (each part written at its offset into a
+    preallocated file). Parameters default to get_download_config().
 
-    bucketname = get_bucketname(
-        page_ep.hocr_url(ep=Endpoint.S3)
+    If etag is given, request is conditional (If-None-Match) and if
+    remote object still has the same ETag nothing is transferred.
+    File is written to a temporary file first, so that local_abspath
+    is never left half written.
+
+    Returns ETag of the local copy or None if remote object does
+    not exist.
+    """
+    default_part_size, default_concurrency, default_threshold = (
+        get_download_config()
     )
+    part_size = part_size or default_part_size
+    concurrency = concurrency or default_concurrency
+    threshold = threshold or default_threshold
+
+    t1 = time.time()
+    s3_client = get_s3_client()
+    kwargs = {
+        'Bucket': bucketname,
+        'Key': keyname,
+        'Range': f"bytes=0-{part_size - 1}"
+    }
+    if etag:
+        kwargs['IfNoneMatch'] = etag
+
+    try:
+        try:
+            response = s3_client.get_object(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'InvalidRange':
+                raise
+            # empty object
+            del kwargs['Range']
+            response = s3_client.get_object(**kwargs)
+    except botocore.exceptions.ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('304', 'NotModified'):
+            return etag
+        if code in ('404', 'NoSuchKey'):
+            return None
+        raise
 
-    keyname = get_keyname(
-        page_ep.hocr_url(ep=Endpoint.S3)
+    # e.g. "bytes 0-8388607/524288000"; missing if whole object
+    # was returned
+    content_range = response.get('ContentRange')
+    total = None
+    if content_range:
+        total = int(content_range.split('/')[-1])
+
+    local_dirname = os.path.dirname(local_abspath)
+    os.makedirs(local_dirname, exist_ok=True)
+    tmpfile = tempfile.NamedTemporaryFile(dir=local_dirname, delete=False)
+    ranges = []
+    try:
+        fd = tmpfile.fileno()
+        if total:
+            os.ftruncate(fd, total)
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(fd, 0, total)
+                except OSError:
+                    # not supported by filesystem, file stays sparse
+                    pass
+        size = _write_body(fd, response['Body'], 0)
+
+        if total:
+            ranges = _get_ranges(total, part_size, threshold)
+        if ranges:
+            max_workers = min(concurrency, len(ranges))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        _download_range,
+                        bucketname,
+                        keyname,
+                        response['ETag'],
+                        fd,
+                        start,
+                        end
+                    )
+                    for start, end in ranges
+                ]
+                for future in futures:
+                    future.result()
+            size = total
+        tmpfile.close()
+    except BaseException:
+        tmpfile.close()
+        os.remove(tmpfile.name)
+        raise
+
+    os.replace(tmpfile.name, local_abspath)
+
+    elapsed = time.time() - t1
+    logger.info(
+        f"Downloaded s3:/{bucketname}/{keyname}"
+        f" size={size / MB:.1f}MB time={elapsed:.2f}s"
+        f" speed={size / MB / max(elapsed, 0.001):.1f}MB/s"
+        f" parts={len(ranges) + 1}"
     )
 
-    if not s3_key_exists(remote_abspath):
-        logger.info(
-            f"Endpoint s3:/{bucketname}/{keyname} missing"
+    return response['ETag']
+
+
+class Backend:
+    """
+    Storage backend interface. Objects are addressed with urls of
+    backend's scheme (e.g. s3:/bucket/docs/user_1/document_2/x.pdf).
+    """
+
+    scheme = None
+
+    def get(self, url, local_abspath, etag=None):
+        """
+        Copies object to local_abspath. If etag is given and object's
+        ETag is the same, nothing is copied.
+
+        Returns ETag of the object or None if it does not exist.
+        """
+        raise NotImplementedError()
+
+    def put(self, local_abspath, url):
+        raise NotImplementedError()
+
+    def put_bytes(self, data, url, content_encoding=None):
+        """
+        Stores data as object. content_encoding (e.g. gzip) is
+        stored as object's metadata, where backend supports it.
+        """
+        raise NotImplementedError()
+
+    def exists(self, url):
+        raise NotImplementedError()
+
+    def exists_many(self, urls):
+        """
+        Returns a dictionary url -> True/False.
+        """
+        return {url: self.exists(url) for url in urls}
+
+    def list(self, prefix_url):
+        """
+        Yields urls of all objects starting with prefix_url.
+        """
+        raise NotImplementedError()
+
+    def delete(self, urls):
+        """
+        Deletes objects; missing objects are ignored. Raises DeleteError
+        listing objects which could not be deleted.
+        """
+        raise NotImplementedError()
+
+    def copy(self, src_url, dst_url):
+        """
+        Copies object within the storage. Returns False if source
+        object does not exist.
+        """
+        raise NotImplementedError()
+
+
+def _common_dirname(keys):
+    """
+    Returns the longest common prefix of keys which ends with /
+    (or empty string).
+    """
+    prefix = os.path.commonprefix(list(keys))
+
+    return prefix[:prefix.rfind('/') + 1]
+
+
+class S3Backend(Backend):
+
+    scheme = 's3'
+
+    def get(self, url, local_abspath, etag=None):
+        return get_object_to_file(
+            get_bucketname(url),
+            get_keyname(url),
+            local_abspath,
+            etag=etag
         )
-        return False
 
-    try:
-        logger.debug((
-            f"Downloading {remote_abspath} to {local_abspath}"
-        ))
-        logger.debug(
-            f"Uploading to bucket={bucketname} "
-            f"Keyname={keyname} "
-            f"Local={local_abspath}."
+    def put(self, local_abspath, url):
+        get_s3_client().upload_file(
+            local_abspath,
+            get_bucketname(url),
+            get_keyname(url)
         )
-        s3_client.download_file(
-            bucketname,
-            keyname,
+
+    def put_bytes(self, data, url, content_encoding=None):
+        kwargs = {}
+        if content_encoding:
+            kwargs['ContentEncoding'] = content_encoding
+        get_s3_client().put_object(
+            Bucket=get_bucketname(url),
+            Key=get_keyname(url),
+            Body=data,
+            **kwargs
+        )
+
+    def exists(self, url):
+        try:
+            get_s3_client().head_object(
+                Bucket=get_bucketname(url),
+                Key=get_keyname(url)
+            )
+        except botocore.exceptions.ClientError:
+            return False
+
+        return True
+
+    def exists_many(self, urls):
+        """
+        Instead of one HEAD request per url, objects under the deepest
+        common "directory" (prefix ending with /) of the urls nested in
+        subdirectories are listed - a single request for all artifacts
+        of a page (page_<num>/<step>/...). Urls directly in the common
+        directory (e.g. page_<num>.txt) are checked with HEAD requests,
+        as listing their directory would list all sibling pages too.
+        """
+        keys_by_bucket = {}
+        for url in urls:
+            keys_by_bucket.setdefault(
+                get_bucketname(url), {}
+            )[get_keyname(url)] = url
+
+        result = {}
+        for bucketname, keys in keys_by_bucket.items():
+            dirname = _common_dirname(keys)
+            nested = [
+                key for key in keys if '/' in key[len(dirname):]
+            ]
+            existing = set()
+            if nested:
+                existing.update(
+                    self._list_keys(bucketname, _common_dirname(nested))
+                )
+            for key, url in keys.items():
+                if key in nested:
+                    result[url] = key in existing
+                else:
+                    result[url] = self.exists(url)
+
+        return result
+
+    def _list_keys(self, bucketname, prefix):
+        paginator = get_s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucketname, Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield item['Key']
+
+    def list(self, prefix_url):
+        bucketname = get_bucketname(prefix_url)
+        for key in self._list_keys(bucketname, get_keyname(prefix_url)):
+            yield f"s3:/{bucketname}/{key}"
+
+    def delete(self, urls):
+        keys_by_bucket = {}
+        for url in urls:
+            keys_by_bucket.setdefault(
+                get_bucketname(url), []
+            ).append(get_keyname(url))
+
+        errors = []
+        s3_client = get_s3_client()
+        for bucketname, keys in keys_by_bucket.items():
+            # delete_objects accepts at most 1000 keys
+            for idx in range(0, len(keys), 1000):
+                response = s3_client.delete_objects(
+                    Bucket=bucketname,
+                    Delete={
+                        'Objects': [
+                            {'Key': key} for key in keys[idx:idx + 1000]
+                        ],
+                        'Quiet': True
+                    }
+                )
+                # in quiet mode, only keys which failed are listed
+                for error in response.get('Errors', []):
+                    url = f"s3:/{bucketname}/{error['Key']}"
+                    logger.error(
+                        f"Delete of {url} failed: {error.get('Code')}"
+                        f" {error.get('Message')}"
+                    )
+                    errors.append((url, error.get('Code')))
+
+        if errors:
+            raise DeleteError(errors)
+
+    def copy(self, src_url, dst_url):
+        try:
+            get_s3_client().copy_object(
+                Bucket=get_bucketname(dst_url),
+                Key=get_keyname(dst_url),
+                CopySource={
+                    'Bucket': get_bucketname(src_url),
+                    'Key': get_keyname(src_url)
+                }
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return False
+            raise
+
+        return True
+
+
+class LocalBackend(Backend):
+    """
+    Directory (e.g. NFS mount shared by all workers) as storage;
+    urls are local:/<abspath>.
+    """
+
+    scheme = 'local'
+
+    def path(self, url):
+        return url[len(self.scheme) + 1:]
+
+    def url(self, path):
+        return f"{self.scheme}:{path}"
+
+    def _etag(self, path):
+        stat = os.stat(path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _copy(self, src, dst):
+        dirname = os.path.dirname(dst)
+        os.makedirs(dirname, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as f:
+            tmp_path = f.name
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+    def get(self, url, local_abspath, etag=None):
+        path = self.path(url)
+        try:
+            new_etag = self._etag(path)
+        except FileNotFoundError:
+            return None
+
+        if new_etag != etag:
+            self._copy(path, local_abspath)
+
+        return new_etag
+
+    def put(self, local_abspath, url):
+        self._copy(local_abspath, self.path(url))
+
+    def put_bytes(self, data, url, content_encoding=None):
+        path = self.path(url)
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+
+    def exists(self, url):
+        return os.path.exists(self.path(url))
+
+    def list(self, prefix_url):
+        prefix = self.path(prefix_url)
+        top = prefix if prefix.endswith(os.sep) else os.path.dirname(prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if path.startswith(prefix):
+                    yield self.url(path)
+
+    def delete(self, urls):
+        for url in urls:
+            try:
+                os.remove(self.path(url))
+            except FileNotFoundError:
+                pass
+
+    def copy(self, src_url, dst_url):
+        if not self.exists(src_url):
+            return False
+        self._copy(self.path(src_url), self.path(dst_url))
+
+        return True
+
+
+class MemoryBackend(Backend):
+    """
+    Objects kept in memory of the process; urls are memory:/<key>.
+    Meant for tests and benchmarks which should not do any network I/O.
+    """
+
+    scheme = 'memory'
+
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def _etag(self, data):
+        return hashlib.md5(data).hexdigest()
+
+    def get(self, url, local_abspath, etag=None):
+        data = self.objects.get(url)
+        if data is None:
+            return None
+
+        new_etag = self._etag(data)
+        if new_etag != etag:
+            os.makedirs(os.path.dirname(local_abspath), exist_ok=True)
+            with open(local_abspath, 'wb') as f:
+                f.write(data)
+
+        return new_etag
+
+    def put(self, local_abspath, url):
+        with open(local_abspath, 'rb') as f:
+            self.put_bytes(f.read(), url)
+
+    def put_bytes(self, data, url, content_encoding=None):
+        with self.lock:
+            self.objects[url] = data
+
+    def exists(self, url):
+        return url in self.objects
+
+    def list(self, prefix_url):
+        with self.lock:
+            urls = [url for url in self.objects if url.startswith(prefix_url)]
+
+        return iter(urls)
+
+    def delete(self, urls):
+        with self.lock:
+            for url in urls:
+                self.objects.pop(url, None)
+
+    def copy(self, src_url, dst_url):
+        with self.lock:
+            if src_url not in self.objects:
+                return False
+            self.objects[dst_url] = self.objects[src_url]
+
+        return True
+
+
+BACKENDS = {
+    backend.scheme: backend for backend in (
+        S3Backend, LocalBackend, MemoryBackend
+    )
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(url=None):
+    """
+    Returns storage backend (one instance per process) for the scheme
+    of given url (s3:/, local:/ or memory:/). Without url, scheme of
+    s3_storage setting (i.e. of remote endpoint) is used.
+    """
+    if url is None:
+        url = get_settings().s3_storage
+
+    scheme = url.split(':', 1)[0]
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unsupported storage url {url}")
+
+    with _backends_lock:
+        if scheme not in _backends:
+            _backends[scheme] = BACKENDS[scheme]()
+
+    return _backends[scheme]
+
+
+def urls_exist(remote_urls):
+    """
+    Batched existence check. Given a list of remote urls (e.g. txt, hocr
+    and image urls of a page), returns a dictionary url -> True/False.
+    For S3 this takes a single listing instead of one HEAD per url.
+    """
+    urls_by_backend = {}
+    for url in remote_urls:
+        urls_by_backend.setdefault(get_backend(url), []).append(url)
+
+    result = {}
+    for backend, urls in urls_by_backend.items():
+        result.update(backend.exists_many(urls))
+
+    return result
+
+
+def download_url(remote_abspath, local_abspath):
+    """
+    Downloads remote_abspath (url of storage backend e.g. S3 url)
+    to local_abspath.
+
+    Object is fetched with a single GET (there is no HEAD request to
+    check its existence first). Returns False if remote object does
+    not exist or download failed.
+    """
+    logger.debug(
+        f"Downloading {remote_abspath} to {local_abspath}"
+    )
+    try:
+        etag = get_backend(remote_abspath).get(
+            remote_abspath,
             local_abspath
         )
-    except botocore.exceptions.ClientError:
+    except (botocore.exceptions.ClientError, OSError):
         logger.error(
             f"Error while downloading "
-            f" {remote_abspath} to {local_abspath}"
-            f" bucketname={bucketname} keyname={keyname}",
+            f" {remote_abspath} to {local_abspath}",
             exc_info=True
         )
         return False
 
+    if etag is None:
+        logger.info(
+            f"Endpoint {remote_abspath} missing"
+        )
+        return False
+
+    if local_abspath.endswith(compression.COMPRESSED_EXTENSIONS):
+        # txt and hocr files might be stored compressed
+        compression.decompress_file(local_abspath)
+
     return True
 
 
+def download_hocr(page_ep):
+
+    if page_ep.hocr_exists():
+        return True
+
+    return download_url(
+        page_ep.hocr_url(ep=Endpoint.S3),
+        page_ep.hocr_url()
+    )
+
+
 def download(
     model_endpoint
 ):
@@ -180,70 +797,11 @@ def download(
     if model_endpoint.exists():
         return True
 
-    remote_abspath = model_endpoint.url(ep=Endpoint.S3)
-    local_abspath = model_endpoint.url()
-    local_dirname = os.path.dirname(local_abspath)
-
-    if not os.path.exists(
-        os.path.dirname(local_abspath)
-    ):
-        logger.debug(f"{local_dirname} does not exists. Creating.")
-        os.makedirs(
-            local_dirname, exist_ok=True
-        )
-    else:
-        logger.debug(f"{local_dirname} already exists.")
-
-    # if not s3_download:
-    #    logger.debug("s3_download=False. Use test data dir.")
-    #    logger.debug(f"Using file {test_local_alternative}")
-    #    copy2doc_url(
-    #        src_file_path=test_local_alternative,
-    #        doc_url=model_endpoint.url()
-    #    )
-
-    s3_client = boto3.client('s3')
-
-    bucketname = get_bucketname(
-        model_endpoint.url(ep=Endpoint.S3)
+    return download_url(
+        model_endpoint.url(ep=Endpoint.S3),
+        model_endpoint.url()
     )
 
-    keyname = get_keyname(
-        model_endpoint.url(ep=Endpoint.S3)
-    )
-
-    if not model_endpoint.exists(ep=Endpoint.S3):
-        logger.info(
-            f"Endpoint s3:/{bucketname}/{keyname} missing"
-        )
-        return False
-
-    try:
-        logger.debug((
-            f"Downloading {remote_abspath} to {local_abspath}"
-        ))
-        logger.debug(
-            f"Uploading to bucket={bucketname} "
-            f"Keyname={keyname} "
-            f"Local={local_abspath}."
-        )
-        s3_client.download_file(
-            bucketname,
-            keyname,
-            local_abspath
-        )
-    except botocore.exceptions.ClientError:
-        logger.error(
-            f"Error while downloading "
-            f" {remote_abspath} to {local_abspath}"
-            f" bucketname={bucketname} keyname={keyname}",
-            exc_info=True
-        )
-        return False
-
-    return True
-
-
 
 class Storage:
     """
@@ -262,18 +820,9 @@ class Storage:
             self.endpoint,
             local_abspath
         ))
-        s3_client = boto3.client('s3')
-
-        if not os.path.exists(
-            os.path.dirname(local_abspath)
-        ):
-            os.makedirs(
-                os.path.dirname(local_abspath), exist_ok=True
-            )
-
         # Download the file from S3
         try:
-            s3_client.download_file(
+            etag = get_object_to_file(
                 self.endpoint.bucketname,
                 self.endpoint.key,
                 local_abspath
@@ -286,6 +835,12 @@ class Storage:
                 ),
                 exc_info=True
             )
+            return
+
+        if etag is None:
+            logger.error(
+                "Endpoint {} missing".format(self.endpoint)
+            )
 
     def download(self, filename=None):
         """
@@ -304,7 +859,7 @@ class Storage:
 
         tmpfile = tempfile.NamedTemporaryFile()
 
-        s3_client = boto3.client('s3')
+        s3_client = get_s3_client()
         logger.debug("Downloading {}/{} -> to local {}".format(
             self.endpoint.bucketname,
             filename,
@@ -329,36 +884,43 @@ class Storage:
         self.tmpfile.close()
 
     def upload(self, filename, content):
-        tmp_local = tempfile.NamedTemporaryFile(
-            mode='w+',
-            encoding='utf-8'
-        )
-        tmp_local.write(content)
-        tmp_local.flush()
+        """
+        Uploads content (str or bytes) as filename object. Content is
+        streamed from memory, no local file is written.
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
 
-        s3_client = boto3.client('s3')
-        s3_client.upload_file(
-            tmp_local.name,
+        s3_client = get_s3_client()
+        s3_client.upload_fileobj(
+            io.BytesIO(content),
             self.endpoint.bucketname,
             filename
         )
-        tmp_local.close()
 
     def remove(self, filename):
-        s3_client = boto3.client('s3')
+        s3_client = get_s3_client()
         s3_client.delete_object(
             Bucket=self.endpoint.bucketname,
             Key=filename
         )
 
+    def remove_many(self, filenames):
+        """
+        Removes objects with batched requests (up to 1000 keys each).
+        """
+        S3Backend().delete([
+            f"s3:/{self.endpoint.bucketname}/{filename}"
+            for filename in filenames
+        ])
+
     @property
     def exists(self):
-        s3 = boto3.resource('s3')
         try:
-            s3.Object(
-                self.endpoint.bucketname,
-                self.endpoint.key
-            ).load()
+            get_s3_client().head_object(
+                Bucket=self.endpoint.bucketname,
+                Key=self.endpoint.key
+            )
         except botocore.exceptions.ClientError as e:
             # Hopefully I am not masking any bad ass errors here
             return False
@@ -366,8 +928,32 @@ class Storage:
         return True
 
     def get_text_content(self):
-        tmp_local = self.download()
-        with open(tmp_local.name, 'r+', encoding='utf-8') as f:
-            text = f.read()
+        """
+        Returns (utf-8 decoded) content of the endpoint. Content is read
+        into memory directly, no local file is written.
+        """
+        return ''.join(self.iter_text_content())
 
-        return text
+    def iter_text_content(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yields (utf-8 decoded) content of the endpoint in chunks of
+        (at most) chunk_size bytes as they arrive from S3. Useful for
+        large text files which should not be held in memory at once.
+        Compressed (gzip, zstd) content is decompressed.
+        """
+        response = get_s3_client().get_object(
+            Bucket=self.endpoint.bucketname,
+            Key=self.endpoint.key
+        )
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = compression.iter_decompress(
+            response['Body'].iter_chunks(chunk_size=chunk_size)
+        )
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
@@ -1,6 +1,10 @@
 from __future__ import absolute_import, unicode_literals
+import os
+import copy
+import shutil
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pmworker import mime
 from pmworker.pdfinfo import get_pagecount
@@ -8,7 +12,7 @@ from pmworker.storage import (
     upload_txt,
     upload_img,
     upload_hocr,
-    download
+    get_s3_pool_size
 )
 from pmworker.endpoint import (
     DocumentEp,
@@ -16,26 +20,107 @@ from pmworker.endpoint import (
     Endpoint
 )
 from pmworker.step import (Step, Steps)
-from pmworker.shortcuts import (
-    extract_img,
-    extract_hocr,
-    extract_txt
+from pmworker.render import (
+    render_page,
+    render_batches,
+    build_img_pyramid
 )
+from pmworker.ocr import ocr_rendered_page
+from pmworker.settings import get_settings
+from pmworker.exceptions import UploadError
+from pmworker.local_cache import get_local_cache
+from pmworker.version_gc import collect_document_versions
+from pmworker.split import (
+    get_document_chunks,
+    summarize,
+    failed_summary,
+    write_summary
+)
+from pmworker.routing import BULK
 from pmworker import pdftk
-from celery import shared_task
+from celery import shared_task, chord, group
 
 logger = logging.getLogger(__name__)
 
 
 def upload_page(page_url):
+    """
+    Uploads page's txt file plus hocr and image of each step listed in
+    upload_step_percents setting (by default all non thumbnail steps).
 
-    upload_txt(page_url)
+    All files are uploaded concurrently; if any of uploads fails,
+    UploadError listing all failed files is raised after remaining
+    uploads complete.
+    """
+    settings = get_settings()
+    percents = getattr(settings, 'upload_step_percents', None) or [
+        step.percent for step in Steps() if not step.is_thumbnail
+    ]
 
+    uploads = [(upload_txt, page_url, page_url.txt_url())]
     for step in Steps():
-        if not step.is_thumbnail:
-            page_url.step = step
-            upload_hocr(page_url)
-            upload_img(page_url)
+        if step.percent not in percents:
+            continue
+        step_url = copy.copy(page_url)
+        step_url.step = step
+        if step.is_for_hocr:
+            uploads.append((upload_hocr, step_url, step_url.hocr_url()))
+        uploads.append((upload_img, step_url, step_url.img_url()))
+
+    errors = []
+    max_workers = min(len(uploads), get_s3_pool_size())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(upload, url): local_url
+            for upload, url, local_url in uploads
+        }
+        for future in as_completed(futures):
+            exc = future.exception()
+            if exc:
+                logger.error(
+                    f"Upload of {futures[future]} failed: {exc}"
+                )
+                errors.append((futures[future], exc))
+
+    if errors:
+        raise UploadError(errors)
+
+
+def fetch_document(
+    doc_ep,
+    s3_download=True,
+    test_local_alternative=None
+):
+    """
+    Makes sure there is an up to date local copy of doc_ep document.
+
+    Local copy is managed by local cache i.e. it is revalidated against
+    remote ETag (conditional GET, no transfer if unchanged).
+
+    With s3_download=False, document is copied from
+    test_local_alternative path instead of downloading it from S3.
+    """
+    if not s3_download:
+        if doc_ep.exists():
+            logger.debug(f"Local copy {doc_ep.url()} exists.")
+            return True
+        logger.debug(f"Using file {test_local_alternative}")
+        os.makedirs(os.path.dirname(doc_ep.url()), exist_ok=True)
+        shutil.copy(test_local_alternative, doc_ep.url())
+        return True
+
+    return get_local_cache().fetch(doc_ep)
+
+
+def pinned_document(doc_ep):
+    """
+    Pins document's local copy and all its page artifacts for the
+    duration of the task, so that local cache won't evict them.
+    """
+    return get_local_cache().pinned(
+        doc_ep.url(),
+        doc_ep.pages_dirname
+    )
 
 
 def ocr_page_pdf(
@@ -45,30 +130,27 @@ def ocr_page_pdf(
 ):
     page_count = get_pagecount(doc_ep.url())
     logger.debug(f"page_count={page_count}")
-    if page_num <= page_count:
-        page_url = PageEp(
-            document_ep=doc_ep,
-            page_num=page_num,
-            step=Step(1),
-            page_count=page_count
-        )
-        extract_img(page_url)
-        extract_txt(
-            page_url,
-            lang=lang
+    if not 1 <= page_num <= page_count:
+        raise ValueError(
+            f"Page {page_num} out of range, document {doc_ep.url()}"
+            f" has {page_count} pages"
         )
 
-        for step in Steps():
-            page_url.step = step
-            extract_img(page_url)
-            # tesseract unterhalt-1.jpg page-1 -l deu hocr
-            if not step.is_thumbnail:
-                extract_hocr(
-                    page_url,
-                    lang=lang
-                )
+    page_url = PageEp(
+        document_ep=doc_ep,
+        page_num=page_num,
+        step=Step(1),
+        page_count=page_count
+    )
+    # page is rasterized once, images of all steps are
+    # derived from that one.
+    render_page(page_url)
+    method = ocr_rendered_page(
+        page_url,
+        lang=lang
+    )
 
-    return page_url
+    return page_url, method
 
 
 @shared_task(bind=True)
@@ -105,62 +187,467 @@ def ocr_page(
         f"Received document_url={doc_ep.url(Endpoint.S3)}"
     )
 
-    if not doc_ep.exists():
-        logger.debug((
-            f"doc_ep={doc_ep.url()} does not exists."
-            f"Processing with download."
-        ))
-        download(
+    with pinned_document(doc_ep):
+        fetch_document(
             doc_ep,
             s3_download=s3_download,
             test_local_alternative=test_local_alternative
         )
-    else:
-        logger.debug(f"Local copy {doc_ep.url()} exists.")
-
-    mime_type = mime.Mime(doc_ep.url())
-
-    page_ep = None
-    page_type = ''
-    if mime_type.is_pdf():
-        tx1 = time.time()
-        page_ep = ocr_page_pdf(
-            doc_ep=doc_ep,
-            page_num=page_num,
-            lang=lang
-        )
-        page_type = 'pdf'
-        tx2 = time.time()
-        logger.info(
-            f"worker_log task_id={self.request.id}"
-            f" user_id={user_id}"
-            f" doc_id={document_id}"
-            f" page_num={page_num} page_type=pdf page_ocr_time={tx2-tx1:.2f}"
-        )
-    else:
+
+        mime_type = mime.Mime(doc_ep.url())
+
+        page_ep = None
+        page_type = ''
+        if mime_type.is_pdf():
+            tx1 = time.time()
+            page_ep, method = ocr_page_pdf(
+                doc_ep=doc_ep,
+                page_num=page_num,
+                lang=lang
+            )
+            page_type = 'pdf'
+            tx2 = time.time()
+            logger.info(
+                f"worker_log task_id={self.request.id}"
+                f" user_id={user_id}"
+                f" doc_id={document_id}"
+                f" page_num={page_num} page_type=pdf"
+                f" page_ocr_time={tx2-tx1:.2f}"
+                f" method={method}"
+            )
+        else:
+            logger.info(
+                f"worker_log task_id={self.request.id}"
+                f" user_id={user_id}"
+                f" doc_id={document_id}"
+                f" page_num={page_num} error=Unkown file type"
+            )
+            return {
+                'page_num': page_num,
+                'blank': False,
+                'error': 'Unknown file type'
+            }
+
+        if page_ep and s3_upload:
+            upload_page(page_ep)
+            logger.info(
+                f"worker_log task_id={self.request.id}"
+                f" user_id={user_id}"
+                f" doc_id={document_id}"
+                f" page_num={page_num} uploaded={page_ep.url(Endpoint.S3)}"
+            )
+
+        t2 = time.time()
         logger.info(
-            f"worker_log task_id={self.request.id}"
-            f" user_id={user_id}"
-            f" doc_id={document_id}"
-            f" page_num={page_num} error=Unkown file type"
+            f"worker_log success task_id={self.request.id}"
+            f" user_id={user_id} doc_id={document_id}"
+            f" page_num={page_num} page_type={page_type}"
+            f" total_exec_time={t2-t1:.2f}"
         )
-        return True
 
-    if page_ep and s3_upload:
-        upload_page(page_ep)
-        logger.info(
+    # blank pages are reported back, so that user can be
+    # offered to delete them
+    return {
+        'page_num': page_num,
+        'blank': method == 'blank'
+    }
+
+
+def ocr_document_page(page_url, lang, s3_upload):
+    """
+    OCRs (and uploads) one page whose largest Step image was
+    already rendered.
+    """
+    t1 = time.time()
+    build_img_pyramid(page_url)
+    method = ocr_rendered_page(page_url, lang=lang)
+    if s3_upload:
+        upload_page(page_url)
+
+    return {
+        'page_num': page_url.page_num,
+        'blank': method == 'blank',
+        'ocr_time': round(time.time() - t1, 2)
+    }
+
+
+@shared_task(bind=True)
+def ocr_document(
+    self,
+    user_id,
+    document_id,
+    file_name,
+    lang,
+    first_page=1,
+    last_page=None,
+    s3_upload=True,
+    s3_download=True,
+    test_local_alternative=None,
+    fail_fast=True
+):
+    """
+    OCRs all pages (or pages first_page..last_page) of the document.
+
+    Document is downloaded and probed only once; pages are rendered in
+    batches (ocr_document_render_batch setting, by default twice the
+    concurrency), one pdftoppm run per batch, and OCRed in parallel
+    while the next batch renders. Number of pages OCRed at once is
+    limited by ocr_document_concurrency setting (defaults to number
+    of CPUs).
+
+    Progress is reported via PROGRESS task state after each page.
+    Returns a list of per page results, each a dictionary with
+    page_num, blank (True for blank pages) and ocr_time keys.
+
+    With fail_fast=False, failure of a page doesn't fail the task,
+    page's result has error key (error message) instead; if the whole
+    range fails (e.g. document cannot be downloaded), each page of the
+    range is reported that way.
+    """
+    logger.info(
+        f"worker_log task_id={self.request.id}"
+        f" user_id={user_id} doc_id={document_id}"
+        f" first_page={first_page} last_page={last_page}"
+    )
+    t1 = time.time()
+    lang = lang.lower()
+
+    doc_ep = DocumentEp(
+        user_id=user_id,
+        document_id=document_id,
+        file_name=file_name,
+    )
+    try:
+        with pinned_document(doc_ep):
+            fetch_document(
+                doc_ep,
+                s3_download=s3_download,
+                test_local_alternative=test_local_alternative
+            )
+
+            if not mime.Mime(doc_ep.url()).is_pdf():
+                logger.info(
+                    f"worker_log task_id={self.request.id}"
+                    f" user_id={user_id}"
+                    f" doc_id={document_id}"
+                    f" error=Unkown file type"
+                )
+                return []
+
+            page_count = get_pagecount(doc_ep.url())
+            last_page = min(last_page or page_count, page_count)
+            page_urls = [
+                PageEp(
+                    document_ep=doc_ep,
+                    page_num=page_num,
+                    step=Step(1),
+                    page_count=page_count
+                )
+                for page_num in range(first_page, last_page + 1)
+            ]
+            settings = get_settings()
+            max_workers = getattr(
+                settings, 'ocr_document_concurrency', None
+            ) or os.cpu_count()
+            batch_size = getattr(
+                settings, 'ocr_document_render_batch', None
+            ) or 2 * max_workers
+
+            results = []
+            # tesseract runs as a separate process, so threads are enough
+            # to keep max_workers CPUs busy; next batch of pages is
+            # rendered meanwhile
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for top_urls in render_batches(page_urls, batch_size):
+                    futures = {
+                        executor.submit(
+                            ocr_document_page,
+                            top_url,
+                            lang=lang,
+                            s3_upload=s3_upload
+                        ): top_url.page_num
+                        for top_url in top_urls
+                    }
+                    for future in as_completed(futures):
+                        try:
+                            result = future.result()
+                        except Exception as exc:
+                            if fail_fast:
+                                raise
+                            logger.error(
+                                f"worker_log task_id={self.request.id}"
+                                f" user_id={user_id}"
+                                f" doc_id={document_id}"
+                                f" page_num={futures[future]} error={exc}",
+                                exc_info=True
+                            )
+                            result = {
+                                'page_num': futures[future],
+                                'blank': False,
+                                'ocr_time': None,
+                                'error': str(exc)
+                            }
+                        results.append(result)
+                        self.update_state(
+                            state='PROGRESS',
+                            meta={
+                                'current': len(results),
+                                'total': len(page_urls),
+                                'page_num': result['page_num']
+                            }
+                        )
+                        if 'error' not in result:
+                            logger.info(
+                                f"worker_log task_id={self.request.id}"
+                                f" user_id={user_id}"
+                                f" doc_id={document_id}"
+                                f" page_num={result['page_num']}"
+                                f" page_type=pdf"
+                                f" page_ocr_time={result['ocr_time']:.2f}"
+                            )
+    except Exception as exc:
+        if fail_fast:
+            raise
+        # chunk level failure (e.g. download) is reported for every
+        # page of the range, so that summary lists them as failed
+        logger.error(
             f"worker_log task_id={self.request.id}"
             f" user_id={user_id}"
             f" doc_id={document_id}"
-            f" page_num={page_num} uploaded={page_ep.url(Endpoint.S3)}"
+            f" first_page={first_page} last_page={last_page}"
+            f" error={exc}",
+            exc_info=True
         )
+        results = [
+            {
+                'page_num': page_num,
+                'blank': False,
+                'ocr_time': None,
+                'error': str(exc)
+            }
+            for page_num in range(first_page, (last_page or first_page) + 1)
+        ]
+
+    results.sort(key=lambda result: result['page_num'])
 
     t2 = time.time()
     logger.info(
         f"worker_log success task_id={self.request.id}"
         f" user_id={user_id} doc_id={document_id}"
-        f" page_num={page_num} page_type={page_type}"
+        f" page_count={len(results)}"
         f" total_exec_time={t2-t1:.2f}"
     )
 
-    return True
+    return results
+
+
+@shared_task(bind=True)
+def ocr_document_split(
+    self,
+    user_id,
+    document_id,
+    file_name,
+    lang,
+    s3_upload=True,
+    s3_download=True,
+    test_local_alternative=None
+):
+    """
+    OCRs large document as a number of ocr_document tasks, each for
+    a chunk (page range) of the document sized by estimated OCR cost
+    (see pmworker.split), so that work is spread across all workers
+    without flooding the queue with per page tasks.
+
+    Chunks run as a celery group (in bulk queue); once all of them complete,
+    ocr_document_summary aggregates their results. Chords require
+    a result backend which supports them (e.g. redis).
+
+    Returns list of dispatched (first_page, last_page) chunks.
+    """
+    t1 = time.time()
+    doc_ep = DocumentEp(
+        user_id=user_id,
+        document_id=document_id,
+        file_name=file_name,
+    )
+    with pinned_document(doc_ep):
+        fetch_document(
+            doc_ep,
+            s3_download=s3_download,
+            test_local_alternative=test_local_alternative
+        )
+        page_count = get_pagecount(doc_ep.url())
+        file_size = os.path.getsize(doc_ep.url())
+
+    chunks = get_document_chunks(page_count, file_size)
+    logger.info(
+        f"worker_log task_id={self.request.id}"
+        f" user_id={user_id} doc_id={document_id}"
+        f" page_count={page_count} chunks={len(chunks)}"
+    )
+
+    summary_kwargs = {
+        'user_id': user_id,
+        'document_id': document_id,
+        'file_name': file_name,
+        'page_count': page_count,
+        'started_at': t1,
+        's3_upload': s3_upload
+    }
+    # chunks report their failures as page results (fail_fast=False);
+    # if a chunk fails anyway (e.g. worker is lost) the callback is not
+    # called and errback writes the summary instead.
+    chord(
+        group(
+            ocr_document.s(
+                user_id=user_id,
+                document_id=document_id,
+                file_name=file_name,
+                lang=lang,
+                first_page=first_page,
+                last_page=last_page,
+                s3_upload=s3_upload,
+                s3_download=s3_download,
+                test_local_alternative=test_local_alternative,
+                fail_fast=False
+            ).set(queue=BULK)
+            for first_page, last_page in chunks
+        ),
+        ocr_document_summary.s(**summary_kwargs).on_error(
+            ocr_document_split_failed.s(**summary_kwargs)
+        )
+    ).apply_async()
+
+    return chunks
+
+
+def save_summary(
+    summary,
+    user_id,
+    document_id,
+    file_name,
+    page_count,
+    s3_upload
+):
+    """
+    Writes summary as ocr_summary.json next to page txt files (and
+    uploads it with s3_upload=True).
+    """
+    page_ep = PageEp(
+        document_ep=DocumentEp(
+            user_id=user_id,
+            document_id=document_id,
+            file_name=file_name,
+        ),
+        page_num=1,
+        step=Step(1),
+        page_count=page_count
+    )
+    remote_dirname = None
+    if s3_upload:
+        remote_dirname = os.path.dirname(page_ep.txt_url(ep=Endpoint.S3))
+    write_summary(
+        os.path.dirname(page_ep.txt_url()),
+        summary,
+        remote_pages_dirname=remote_dirname
+    )
+
+
+@shared_task
+def ocr_document_summary(
+    chunk_results,
+    user_id,
+    document_id,
+    file_name,
+    page_count,
+    started_at,
+    s3_upload=True
+):
+    """
+    Chord callback of ocr_document_split. Writes per document summary
+    (page count, timings, blank and failed pages) as ocr_summary.json
+    next to page txt files (and uploads it with s3_upload=True).
+    """
+    summary = summarize(
+        chunk_results,
+        page_count=page_count,
+        started_at=started_at,
+        finished_at=time.time()
+    )
+    save_summary(
+        summary,
+        user_id=user_id,
+        document_id=document_id,
+        file_name=file_name,
+        page_count=page_count,
+        s3_upload=s3_upload
+    )
+    logger.info(
+        f"worker_log success user_id={user_id} doc_id={document_id}"
+        f" page_count={page_count}"
+        f" failed_pages={len(summary['failed_pages'])}"
+        f" total_exec_time={summary['total_time']:.2f}"
+    )
+
+    return summary
+
+
+@shared_task
+def ocr_document_split_failed(
+    request,
+    exc,
+    traceback,
+    user_id,
+    document_id,
+    file_name,
+    page_count,
+    started_at,
+    s3_upload=True
+):
+    """
+    Errback of ocr_document_split chord: some chunk failed as a whole,
+    results of the other chunks are not available. Writes summary
+    marking all pages as failed.
+    """
+    summary = failed_summary(
+        str(exc),
+        page_count=page_count,
+        started_at=started_at,
+        finished_at=time.time()
+    )
+    save_summary(
+        summary,
+        user_id=user_id,
+        document_id=document_id,
+        file_name=file_name,
+        page_count=page_count,
+        s3_upload=s3_upload
+    )
+    logger.error(
+        f"worker_log user_id={user_id} doc_id={document_id}"
+        f" page_count={page_count} error={exc}"
+    )
+
+    return summary
+
+
+@shared_task
+def gc_document_versions(
+    user_id,
+    document_id,
+    file_name,
+    keep=None,
+    remote=True
+):
+    """
+    Removes all but last keep (gc_keep_versions setting) versions of
+    the document (originals and page artifacts) from shared storage
+    (unless remote=False) and from local MEDIA_ROOT.
+    """
+    return collect_document_versions(
+        user_id=user_id,
+        document_id=document_id,
+        file_name=file_name,
+        keep=keep,
+        remote=remote
+    )
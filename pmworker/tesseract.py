@@ -0,0 +1,46 @@
+import logging
+from pmworker import wrapper
+
+logger = logging.getLogger(__name__)
+
+
+class Tesseract(wrapper.Wrapper):
+    """
+    Thin wrapper around tesseract command line utility.
+
+    A single tesseract run can produce several outputs (e.g. txt and hocr)
+    from the same recognition pass - just list all wanted output
+    configurations.
+    """
+
+    def __init__(self, lang, dry_run=False):
+        super().__init__(exec_name="tesseract", dry_run=dry_run)
+        self.lang = lang
+
+    def get_cmd_ocr(self, image_path, output_base, configs):
+        """
+        image_path - path to the image to be OCRed
+        output_base - output file path without extention; tesseract
+            will append .txt, .hocr etc. for each of configs
+        configs - list of tesseract output configurations
+        """
+        cmd = self.get_cmd()
+
+        cmd.extend([image_path, output_base])
+        cmd.extend(['-l', self.lang])
+        cmd.extend(configs)
+
+        return cmd
+
+    def __call__(self, image_path, output_base, configs=('txt', 'hocr')):
+        cmd = self.get_cmd_ocr(
+            image_path=image_path,
+            output_base=output_base,
+            configs=configs
+        )
+        result = self.run(cmd)
+
+        if result.returncode:
+            raise Exception(
+                "Error occured during tesseract: %s " % result.stderr
+            )
@@ -0,0 +1,215 @@
+import os
+import html
+import logging
+import unicodedata
+import xml.etree.ElementTree as ET
+
+from pmworker.hocr import wrap_hocr_page
+from pmworker.pdftotext import Pdftotext
+from pmworker.settings import get_settings
+
+"""
+Born-digital PDF pages already contain text. For such pages txt and hOCR
+files are built from the embedded text layer instead of OCRing the page.
+"""
+
+logger = logging.getLogger(__name__)
+
+# minimal number of characters on the page for its text layer to be used
+DEFAULT_MIN_CHARS = 100
+# minimal ratio of characters properly mapped to Unicode
+DEFAULT_MIN_UNICODE_RATIO = 0.9
+
+
+def _local_name(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _children(element, name):
+    return [
+        child for child in element if _local_name(child) == name
+    ]
+
+
+def _bbox(element, factor):
+    return tuple(
+        int(round(float(element.get(attr)) * factor))
+        for attr in ('xMin', 'yMin', 'xMax', 'yMax')
+    )
+
+
+def _bbox_title(bbox):
+    return "bbox %d %d %d %d" % bbox
+
+
+class TextLayer:
+    """
+    Text layer of one page as parsed from pdftotext -bbox-layout output.
+    """
+
+    def __init__(self, content):
+        root = ET.fromstring(content)
+        pages = [
+            element for element in root.iter()
+            if _local_name(element) == 'page'
+        ]
+        if not pages:
+            raise ValueError("No page in pdftotext output")
+
+        self.page = pages[0]
+        self.width = float(self.page.get('width'))
+        self.height = float(self.page.get('height'))
+
+    def blocks(self):
+        for flow in _children(self.page, 'flow'):
+            for block in _children(flow, 'block'):
+                yield block
+
+    def words(self):
+        for block in self.blocks():
+            for line in _children(block, 'line'):
+                for word in _children(line, 'word'):
+                    yield word.text or ''
+
+    @property
+    def text(self):
+        paragraphs = []
+        for block in self.blocks():
+            lines = [
+                ' '.join(word.text or '' for word in _children(line, 'word'))
+                for line in _children(block, 'line')
+            ]
+            paragraphs.append('\n'.join(lines))
+
+        return '\n\n'.join(paragraphs) + '\n'
+
+    def stats(self):
+        """
+        Returns a tuple (number of characters, ratio of characters
+        mapped to Unicode); i.e. characters which are not
+        replacement characters, private use or control characters.
+        """
+        chars = ''.join(self.words())
+        if not chars:
+            return 0, 0
+
+        mapped = sum(
+            1 for char in chars
+            if char != '\ufffd' and unicodedata.category(char) not in (
+                'Co', 'Cc', 'Cn'
+            )
+        )
+
+        return len(chars), mapped / len(chars)
+
+    def is_usable(self, min_chars, min_unicode_ratio):
+        count, ratio = self.stats()
+
+        return count >= min_chars and ratio >= min_unicode_ratio
+
+    def to_hocr(self, width, lang, image=None):
+        """
+        Returns hOCR document for the page rendered with given
+        width (in pixels).
+        """
+        factor = width / self.width
+        page_bbox = (
+            0, 0, int(round(self.width * factor)),
+            int(round(self.height * factor))
+        )
+        page_title = _bbox_title(page_bbox) + "; ppageno 0"
+        if image:
+            page_title = f'image "{image}"; {page_title}'
+
+        out = [f"  <div class='ocr_page' id='page_1' title='{page_title}'>"]
+        word_id = line_id = 0
+        for block_id, block in enumerate(self.blocks(), 1):
+            bbox = _bbox_title(_bbox(block, factor))
+            out.append(
+                f"   <div class='ocr_carea' id='block_1_{block_id}'"
+                f" title=\"{bbox}\">"
+            )
+            out.append(
+                f"    <p class='ocr_par' id='par_1_{block_id}'"
+                f" lang='{lang}' title=\"{bbox}\">"
+            )
+            for line in _children(block, 'line'):
+                line_id += 1
+                out.append(
+                    f"     <span class='ocr_line' id='line_1_{line_id}'"
+                    f" title=\"{_bbox_title(_bbox(line, factor))}\">"
+                )
+                for word in _children(line, 'word'):
+                    word_id += 1
+                    out.append(
+                        f"      <span class='ocrx_word'"
+                        f" id='word_1_{word_id}'"
+                        f" title='{_bbox_title(_bbox(word, factor))};"
+                        f" x_wconf 100'>{html.escape(word.text or '')}</span>"
+                    )
+                out.append("     </span>")
+            out.append("    </p>")
+            out.append("   </div>")
+        out.append("  </div>")
+
+        return wrap_hocr_page(
+            '\n'.join(out),
+            lang=lang,
+            system='pdftotext'
+        )
+
+
+def extract_text_layer(page_url, lang):
+    """
+    If page has usable embedded text layer, writes page_url.txt_url() and
+    page_url.hocr_url() based on it and returns True; returns False
+    if page needs to be OCRed.
+
+    Text layer is usable if it has at least text_layer_min_chars
+    characters and at least text_layer_min_unicode_ratio of them
+    map to Unicode.
+    """
+    settings = get_settings()
+    min_chars = getattr(
+        settings, 'text_layer_min_chars', DEFAULT_MIN_CHARS
+    )
+    min_unicode_ratio = getattr(
+        settings, 'text_layer_min_unicode_ratio', DEFAULT_MIN_UNICODE_RATIO
+    )
+    if min_chars is None:
+        # text layer detection disabled
+        return False
+
+    try:
+        text_layer = TextLayer(
+            Pdftotext().bbox_layout(
+                page_url.document_ep.url(),
+                page_url.page_num
+            )
+        )
+    except Exception:
+        logger.warning(
+            f"Failed to read text layer of {page_url.url()}",
+            exc_info=True
+        )
+        return False
+
+    if not text_layer.is_usable(min_chars, min_unicode_ratio):
+        return False
+
+    logger.debug(f"Using embedded text layer for {page_url.url()}")
+    for path in (page_url.txt_url(), page_url.hocr_url()):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(page_url.txt_url(), 'w', encoding='utf-8') as f:
+        f.write(text_layer.text)
+    with open(page_url.hocr_url(), 'w', encoding='utf-8') as f:
+        f.write(
+            text_layer.to_hocr(
+                width=page_url.step.width,
+                lang=lang,
+                image=page_url.img_url()
+            )
+        )
+
+    return True
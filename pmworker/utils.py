@@ -0,0 +1,12 @@
+import os
+
+
+def file_version(filepath):
+    """
+    Returns a tuple (size, mtime) which changes whenever file's content
+    changes. Suitable as (part of) cache key for results derived from
+    file's content.
+    """
+    stat = os.stat(filepath)
+
+    return stat.st_size, stat.st_mtime_ns
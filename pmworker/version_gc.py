@@ -0,0 +1,207 @@
+import os
+import re
+import shutil
+import logging
+
+from pmworker.endpoint import (
+    DocumentEp,
+    Endpoint
+)
+from pmworker.local_cache import get_local_cache
+from pmworker.settings import get_settings
+from pmworker.storage import get_backend
+
+"""
+Garbage collection of old document versions.
+
+Each page operation (reorder, delete, paste) creates a new document
+version i.e. new copy of the original and of all page artifacts:
+
+    docs/user_<id>/document_<id>/[v<N>/]<file_name>
+    results/user_<id>/document_<id>/[v<N>/]pages/...
+
+(version 0 has no v<N> directory). Only last few versions are kept,
+older ones are removed both from shared storage and from local
+MEDIA_ROOT. Shared storage is listed once per prefix and objects are
+removed with batched (up to 1000 keys) deletes.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_VERSIONS = 2
+
+AUX_DIRS = ('docs', 'results')
+
+VERSION_DIR_RE = re.compile(r"^v(\d+)$")
+
+
+def version_of(relpath):
+    """
+    Returns document version of the path relative to document's
+    directory e.g. 3 for v3/pages/page_1.txt, 0 for pages/page_1.txt.
+    """
+    first, sep, _ = relpath.partition('/')
+    match = VERSION_DIR_RE.match(first)
+    if sep and match:
+        return int(match.group(1))
+
+    return 0
+
+
+def group_by_version(urls, prefix):
+    """
+    Returns dictionary version -> list of urls; all urls start
+    with prefix (document's directory).
+    """
+    versions = {}
+    for url in urls:
+        versions.setdefault(
+            version_of(url[len(prefix):]), []
+        ).append(url)
+
+    return versions
+
+
+def get_stale_versions(versions, keep):
+    """
+    Returns versions to remove, i.e. all but last keep versions.
+    """
+    if keep < 1:
+        raise ValueError("At least one version must be kept")
+
+    return sorted(versions)[:-keep]
+
+
+def get_document_prefixes(user_id, document_id, file_name):
+    """
+    Returns a list of (remote prefix, local directory) of document's
+    original and of its page artifacts.
+    """
+    prefixes = []
+    for aux_dir in AUX_DIRS:
+        doc_ep = DocumentEp(
+            user_id=user_id,
+            document_id=document_id,
+            file_name=file_name,
+            aux_dir=aux_dir
+        )
+        prefixes.append((
+            os.path.dirname(doc_ep.url(ep=Endpoint.S3)) + '/',
+            os.path.dirname(doc_ep.url()) + '/'
+        ))
+
+    return prefixes
+
+
+def get_local_versions(local_dirname):
+    """
+    Returns dictionary version -> list of paths (files and version
+    directories) of local document directory.
+    """
+    versions = {}
+    if not os.path.isdir(local_dirname):
+        return versions
+
+    for name in os.listdir(local_dirname):
+        path = os.path.join(local_dirname, name)
+        match = VERSION_DIR_RE.match(name)
+        if match and os.path.isdir(path):
+            versions.setdefault(int(match.group(1)), []).append(path)
+        else:
+            versions.setdefault(0, []).append(path)
+
+    return versions
+
+
+def remove_local(paths, pinned):
+    removed = 0
+    for path in paths:
+        if any(
+            pin == path or pin.startswith(path.rstrip(os.sep) + os.sep)
+            for pin in pinned
+        ):
+            logger.info(f"Skip removing {path}, it is in use")
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        removed += 1
+
+    return removed
+
+
+def collect_document_versions(
+    user_id,
+    document_id,
+    file_name,
+    keep=None,
+    remote=True
+):
+    """
+    Removes all but last keep (gc_keep_versions setting) versions of
+    the document, locally and (with remote=True) in shared storage.
+
+    Returns a dictionary with removed versions and number of removed
+    remote objects and local paths. Raises DeleteError if some of
+    remote objects could not be deleted.
+    """
+    if keep is None:
+        keep = getattr(
+            get_settings(), 'gc_keep_versions', DEFAULT_KEEP_VERSIONS
+        )
+
+    listings = []
+    all_versions = set()
+    for remote_prefix, local_dirname in get_document_prefixes(
+        user_id, document_id, file_name
+    ):
+        remote_versions = {}
+        if remote:
+            # one listing (paginated) per prefix
+            remote_versions = group_by_version(
+                get_backend(remote_prefix).list(remote_prefix),
+                remote_prefix
+            )
+        local_versions = get_local_versions(local_dirname)
+        all_versions.update(remote_versions)
+        all_versions.update(local_versions)
+        listings.append((remote_prefix, remote_versions, local_versions))
+
+    stale = get_stale_versions(all_versions, keep)
+    result = {
+        'removed_versions': stale,
+        'remote_objects': 0,
+        'local_paths': 0
+    }
+    if not stale:
+        return result
+
+    pinned = get_local_cache().pinned_paths()
+    for remote_prefix, remote_versions, local_versions in listings:
+        urls = [
+            url
+            for version in stale
+            for url in remote_versions.get(version, [])
+        ]
+        if urls:
+            get_backend(remote_prefix).delete(urls)
+            result['remote_objects'] += len(urls)
+
+        result['local_paths'] += remove_local(
+            [
+                path
+                for version in stale
+                for path in local_versions.get(version, [])
+            ],
+            pinned
+        )
+
+    logger.info(
+        f"Document user_id={user_id} doc_id={document_id}"
+        f" removed versions={stale}"
+        f" remote_objects={result['remote_objects']}"
+        f" local_paths={result['local_paths']}"
+    )
+
+    return result
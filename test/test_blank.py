@@ -0,0 +1,64 @@
+import os
+import random
+import tempfile
+import unittest
+
+from PIL import Image, ImageDraw, ImageFont
+
+from pmworker.blank import (
+    is_blank,
+    DEFAULT_MAX_INK_RATIO,
+    DEFAULT_MAX_STDDEV
+)
+
+
+class TestBlank(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def page(self, lines=(), specks=0):
+        # page at 100% scaled down to 50% (image blank detection runs on)
+        image = Image.new('L', (1240, 1753), 245)
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=24)
+        for idx, line in enumerate(lines):
+            draw.text((100, 150 + idx * 40), line, fill=20, font=font)
+        rand = random.Random(1)
+        for _ in range(specks):
+            x, y = rand.randrange(1240), rand.randrange(1753)
+            draw.point((x, y), fill=60)
+        path = os.path.join(self.tmp.name, "page.jpg")
+        image.resize((620, 876), Image.LANCZOS).save(path)
+
+        return path
+
+    def assertBlank(self, path, blank=True):
+        self.assertEqual(
+            is_blank(
+                path,
+                max_ink_ratio=DEFAULT_MAX_INK_RATIO,
+                max_stddev=DEFAULT_MAX_STDDEV
+            ),
+            blank
+        )
+
+    def test_blank_page(self):
+        self.assertBlank(self.page())
+
+    def test_scan_noise(self):
+        self.assertBlank(self.page(specks=20))
+
+    def test_page_with_text(self):
+        self.assertBlank(self.page(["Lorem ipsum dolor sit amet"] * 30), False)
+
+    def test_single_line_of_text(self):
+        for line in (
+            "Page 4 of 4",
+            "Berlin, 17.03.2024  Signature: ____",
+            "Invoice 2024-03-17  Total amount due"
+        ):
+            self.assertBlank(self.page([line]), False)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker import compression
+from pmworker.storage import MemoryBackend, upload_text_artifact
+
+HOCR = ("<div class='ocr_page' title='bbox 0 0 1240 1754'>" * 100).encode()
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_gzip(self):
+        data = compression.compress(HOCR, compression.GZIP)
+
+        self.assertLess(len(data), len(HOCR))
+        self.assertEqual(compression.sniff(data), compression.GZIP)
+        self.assertEqual(compression.decompress(data), HOCR)
+        # deterministic output
+        self.assertEqual(data, compression.compress(HOCR, compression.GZIP))
+
+    @unittest.skipUnless(
+        compression.is_zstd_available(),
+        "zstandard is not installed"
+    )
+    def test_zstd(self):
+        data = compression.compress(HOCR, compression.ZSTD)
+
+        self.assertEqual(compression.sniff(data), compression.ZSTD)
+        self.assertEqual(compression.decompress(data), HOCR)
+
+    def test_plain_data_is_unchanged(self):
+        self.assertIsNone(compression.sniff(HOCR))
+        self.assertEqual(compression.decompress(HOCR), HOCR)
+        self.assertEqual(compression.decompress(b''), b'')
+
+    def test_iter_decompress(self):
+        data = compression.compress(HOCR, compression.GZIP)
+        chunks = [data[:1], data[1:10], data[10:]]
+
+        self.assertEqual(
+            b''.join(compression.iter_decompress(chunks)),
+            HOCR
+        )
+        self.assertEqual(
+            b''.join(compression.iter_decompress([HOCR[:2], HOCR[2:]])),
+            HOCR
+        )
+
+    def test_upload_compressed(self):
+        backend = MemoryBackend()
+        url = "memory:/bucket/results/page-1.hocr"
+        with tempfile.TemporaryDirectory() as tmp:
+            hocr_path = os.path.join(tmp, "page-1.hocr")
+            with open(hocr_path, 'wb') as f:
+                f.write(HOCR)
+
+            with mock.patch(
+                'pmworker.compression.get_settings',
+                return_value=mock.Mock(artifact_compression='gzip')
+            ), mock.patch(
+                'pmworker.storage.get_backend',
+                return_value=backend
+            ):
+                upload_text_artifact(hocr_path, url)
+
+        self.assertEqual(
+            compression.sniff(backend.objects[url]),
+            compression.GZIP
+        )
+        self.assertEqual(compression.decompress(backend.objects[url]), HOCR)
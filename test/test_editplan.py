@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pmworker.endpoint import DocumentEp, Endpoint
+from pmworker.editplan import compose, get_cat_args, edit_pages
+from pmworker.pdfinfo import get_pagecount
+from pmworker import pdfengine
+
+test_dir = Path(__file__).parent
+test_data_dir = test_dir / Path("data")
+abs_path_input_pdf = test_data_dir / Path("input.de.pdf")
+
+
+class Doc:
+
+    def __init__(self, path):
+        self.path = path
+
+    def url(self):
+        return self.path
+
+
+class TestCompose(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = Doc("/docs/a.pdf")
+        self.other = Doc("/docs/b.pdf")
+
+    def test_delete_reorder_paste(self):
+        page_sources = compose(
+            self.doc,
+            [
+                # a1 a2 a4 a5
+                {'op': 'delete', 'page_numbers': [3]},
+                # a5 a2 a4 a1
+                {'op': 'reorder', 'new_order': [
+                    {'page_num': 4, 'page_order': 1},
+                    {'page_num': 2, 'page_order': 2},
+                    {'page_num': 3, 'page_order': 3},
+                    {'page_num': 1, 'page_order': 4},
+                ]},
+                # a5 b2 b1 a2 a4 a1
+                {
+                    'op': 'paste',
+                    'src_doc_ep_list': [
+                        {'doc_ep': self.other, 'page_nums': [2, 1]}
+                    ],
+                    'after_page_number': 1
+                }
+            ],
+            page_count=5
+        )
+
+        self.assertEqual(
+            page_sources,
+            [
+                (self.doc, 5),
+                (self.other, 2),
+                (self.other, 1),
+                (self.doc, 2),
+                (self.doc, 4),
+                (self.doc, 1),
+            ]
+        )
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            compose(self.doc, [{'op': 'rotate'}], page_count=2)
+
+    def test_cat_args(self):
+        sources, pages = get_cat_args(
+            [(self.doc, 2), (self.other, 1), (self.doc, 1)]
+        )
+        self.assertEqual(
+            sources,
+            {'A': "/docs/a.pdf", 'B': "/docs/b.pdf"}
+        )
+        self.assertEqual(pages, [('A', 2), ('B', 1), ('A', 1)])
+
+
+@unittest.skipUnless(pdfengine.is_available(), "pikepdf is not installed")
+class TestEditPages(unittest.TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.doc_ep = DocumentEp(
+            remote_endpoint=Endpoint("s3:/test-papermerge/"),
+            local_endpoint=Endpoint(f"local:{self.media}"),
+            user_id=1,
+            document_id=3,
+            file_name="x.pdf"
+        )
+        os.makedirs(os.path.dirname(self.doc_ep.url()))
+        shutil.copy(abs_path_input_pdf, self.doc_ep.url())
+
+    def tearDown(self):
+        shutil.rmtree(self.media)
+
+    def test_one_version_per_plan(self):
+        page_count = get_pagecount(self.doc_ep.url())
+        version = edit_pages(
+            self.doc_ep,
+            [
+                {'op': 'delete', 'page_numbers': [1]},
+                {
+                    'op': 'paste',
+                    'src_doc_ep_list': [{
+                        'doc_ep': DocumentEp(
+                            remote_endpoint=Endpoint("s3:/test-papermerge/"),
+                            local_endpoint=Endpoint(f"local:{self.media}"),
+                            user_id=1,
+                            document_id=3,
+                            file_name="x.pdf"
+                        ),
+                        'page_nums': [1, 2]
+                    }],
+                }
+            ],
+            migrate_ocr=False
+        )
+
+        self.assertEqual(version, 1)
+        self.assertEqual(
+            get_pagecount(self.doc_ep.url()),
+            page_count - 1 + 2
+        )
@@ -0,0 +1,34 @@
+import unittest
+from pmworker.hocr import rescale_hocr
+
+HOCR = """<div class='ocr_page' id='page_1' title='image "page-1.jpg"; bbox 0 0 1240 1753; ppageno 0'>
+ <span class='ocr_line' id='line_1_1' title="bbox 100 200 300 240; baseline 0.005 -10; x_size 30; x_descenders 6; x_ascenders 8">
+  <span class='ocrx_word' id='word_1_1' title='bbox 100 200 180 240; x_wconf 96'>Hallo</span>
+ </span>
+</div>"""
+
+
+class TestHOCR(unittest.TestCase):
+
+    def test_rescale_identity(self):
+        self.assertEqual(
+            rescale_hocr(HOCR, 1),
+            HOCR
+        )
+
+    def test_rescale_bbox(self):
+        result = rescale_hocr(HOCR, 1.25)
+
+        self.assertIn("bbox 0 0 1550 2191; ppageno 0", result)
+        self.assertIn("bbox 125 250 225 300; x_wconf 96", result)
+        self.assertIn(
+            "baseline 0.005 -12; x_size 37.5; x_descenders 7.5",
+            result
+        )
+        # text content is left untouched
+        self.assertIn(">Hallo</span>", result)
+
+    def test_rescale_image(self):
+        result = rescale_hocr(HOCR, 0.75, image="75/page-1.jpg")
+
+        self.assertIn('image "75/page-1.jpg"; bbox 0 0 930 1315', result)
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker.local_cache import LocalCache
+
+
+def write(path, size, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+class TestLocalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.doc_1 = os.path.join(
+            self.root, "docs", "user_1", "document_1", "x.pdf"
+        )
+        self.doc_2 = os.path.join(
+            self.root, "docs", "user_1", "document_2", "y.pdf"
+        )
+        self.page_1 = os.path.join(
+            self.root, "results", "user_1", "document_1",
+            "pages", "page_1.txt"
+        )
+        write(self.doc_1, 100, 1000)
+        write(self.page_1, 100, 2000)
+        write(self.doc_2, 100, 3000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_evict_least_recently_used(self):
+        cache = LocalCache(self.root, max_bytes=250)
+        cache.evict()
+
+        self.assertFalse(os.path.exists(self.doc_1))
+        # empty directories are removed as well
+        self.assertFalse(os.path.exists(os.path.dirname(self.doc_1)))
+        self.assertTrue(os.path.exists(self.page_1))
+        self.assertTrue(os.path.exists(self.doc_2))
+
+    def test_touch_updates_lru_order(self):
+        cache = LocalCache(self.root, max_bytes=250)
+        cache.touch(self.doc_1)
+        cache.evict()
+
+        self.assertTrue(os.path.exists(self.doc_1))
+        self.assertFalse(os.path.exists(self.page_1))
+
+    def test_touch_keeps_mtime(self):
+        # mtime is part of cache keys (page count, mime type)
+        cache = LocalCache(self.root, max_bytes=250)
+        mtime = os.stat(self.doc_1).st_mtime_ns
+        cache.touch(self.doc_1)
+
+        self.assertEqual(os.stat(self.doc_1).st_mtime_ns, mtime)
+
+    def test_pinned_files_are_not_evicted(self):
+        cache = LocalCache(self.root, max_bytes=150)
+        pages_dir = os.path.join(
+            self.root, "results", "user_1", "document_1", "pages/"
+        )
+        with cache.pinned(self.doc_1, pages_dir):
+            self.assertEqual(
+                cache.pinned_paths(),
+                {self.doc_1, pages_dir}
+            )
+            cache.evict()
+            self.assertTrue(os.path.exists(self.doc_1))
+            self.assertTrue(os.path.exists(self.page_1))
+            self.assertFalse(os.path.exists(self.doc_2))
+
+        self.assertEqual(cache.pinned_paths(), set())
+
+    def test_stale_pins_are_removed(self):
+        cache = LocalCache(self.root, max_bytes=150)
+        os.makedirs(cache.pins_dir)
+        # pid which for sure does not exist
+        write(os.path.join(cache.pins_dir, "abc.999999999.1"), 1, 0)
+
+        self.assertEqual(cache.pinned_paths(), set())
+        self.assertEqual(os.listdir(cache.pins_dir), [])
+
+    def test_stale_pin_removed_concurrently(self):
+        cache = LocalCache(self.root, max_bytes=150)
+        os.makedirs(cache.pins_dir)
+        write(os.path.join(cache.pins_dir, "abc.999999999.1"), 1, 0)
+
+        # other worker removed the pin first
+        with mock.patch(
+            'pmworker.local_cache.os.remove',
+            side_effect=FileNotFoundError
+        ):
+            self.assertEqual(cache.pinned_paths(), set())
+
+    def test_no_budget_no_eviction(self):
+        cache = LocalCache(self.root, max_bytes=None)
+        cache.evict()
+
+        self.assertTrue(os.path.exists(self.doc_1))
+        self.assertTrue(os.path.exists(self.page_1))
+        self.assertTrue(os.path.exists(self.doc_2))
+
+    def test_etag(self):
+        cache = LocalCache(self.root)
+
+        self.assertIsNone(cache.get_etag(self.doc_1))
+        cache.set_etag(self.doc_1, '"abc"')
+        self.assertEqual(cache.get_etag(self.doc_1), '"abc"')
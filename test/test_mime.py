@@ -1,7 +1,9 @@
 import os
+import tempfile
 from pathlib import Path
 import unittest
 from pmworker import mime
+from pmworker.document_file import DocumentFile
 
 DATA_DIR = os.path.join(
     Path(__file__).parent,
@@ -21,3 +23,42 @@ class TestConvert(unittest.TestCase):
         self.assertTrue(
             mime_type.is_pdf()
         )
+
+    def test_sniff_images(self):
+        headers = (
+            (b'\x89PNG\r\n\x1a\n\x00\x00', 'image/png'),
+            (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'image/jpeg'),
+            (b'II*\x00\x08\x00\x00\x00', 'image/tiff'),
+            (b'MM\x00*\x00\x00\x00\x08', 'image/tiff'),
+        )
+        for header, expected in headers:
+            with tempfile.NamedTemporaryFile() as f:
+                f.write(header)
+                f.flush()
+                mime_type = mime.Mime(filepath=f.name)
+                self.assertEqual(mime_type.guess(), expected)
+                self.assertTrue(mime_type.is_image())
+                self.assertFalse(mime_type.is_pdf())
+
+    def test_document_file_agrees(self):
+        headers = (
+            (".png", b'\x89PNG\r\n\x1a\n\x00\x00'),
+            (".jpg", b'\xff\xd8\xff\xe0\x00\x10JFIF'),
+            (".tiff", b'II*\x00\x08\x00\x00\x00'),
+            (".tif", b'MM\x00*\x00\x00\x00\x08'),
+        )
+        for suffix, header in headers:
+            with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+                f.write(header)
+                f.flush()
+                doc_file = DocumentFile(
+                    "", os.path.basename(f.name), os.path.dirname(f.name)
+                )
+                self.assertTrue(doc_file.is_image)
+                self.assertTrue(mime.Mime(filepath=f.name).is_image())
+
+    def test_sniff_unknown(self):
+        with tempfile.NamedTemporaryFile(suffix=".txt") as f:
+            f.write(b'just some text')
+            f.flush()
+            self.assertIsNone(mime.sniff(f.name))
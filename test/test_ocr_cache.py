@@ -0,0 +1,106 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker.ocr_cache import (
+    LocalTier,
+    OcrCache,
+    cache_key,
+    get_stats
+)
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+class TestOcrCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.txt = os.path.join(self.tmp.name, "page_1.txt")
+        self.hocr = os.path.join(self.tmp.name, "page-1.hocr")
+        write(self.txt, "Hallo")
+        write(self.hocr, "<html>Hallo</html>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache_key(self):
+        img = os.path.join(self.tmp.name, "page-1.jpg")
+        write(img, "image data")
+
+        self.assertEqual(
+            cache_key(img, "deu"),
+            cache_key(img, "deu")
+        )
+        self.assertNotEqual(
+            cache_key(img, "deu"),
+            cache_key(img, "eng")
+        )
+
+    def test_local_tier_hit_and_miss(self):
+        tier = LocalTier(os.path.join(self.tmp.name, "cache"))
+        cache = OcrCache([tier])
+        out_txt = os.path.join(self.tmp.name, "out.txt")
+        out_hocr = os.path.join(self.tmp.name, "out.hocr")
+        hits = get_stats().get('hits', 0)
+        misses = get_stats().get('misses', 0)
+
+        self.assertFalse(cache.get("abcd", out_txt, out_hocr))
+        cache.put("abcd", self.txt, self.hocr)
+        self.assertTrue(cache.get("abcd", out_txt, out_hocr))
+
+        self.assertEqual(read(out_txt), "Hallo")
+        self.assertEqual(read(out_hocr), "<html>Hallo</html>")
+        self.assertEqual(get_stats()['hits'], hits + 1)
+        self.assertEqual(get_stats()['misses'], misses + 1)
+
+    def test_failing_tiers(self):
+        out_txt = os.path.join(self.tmp.name, "out.txt")
+        out_hocr = os.path.join(self.tmp.name, "out.hocr")
+        # e.g. full disk
+        local = mock.Mock()
+        local.get.side_effect = OSError("No space left on device")
+        local.put.side_effect = OSError("No space left on device")
+        remote = LocalTier(os.path.join(self.tmp.name, "remote"))
+        remote.put("abcd", self.txt, self.hocr)
+        cache = OcrCache([local, remote])
+
+        # hit in remote tier despite failing read of and promotion
+        # into local tier
+        self.assertTrue(cache.get("abcd", out_txt, out_hocr))
+        self.assertEqual(read(out_txt), "Hallo")
+        local.put.assert_called_once()
+
+        # failing tier is a miss
+        broken = mock.Mock()
+        broken.get.side_effect = IOError("S3 error")
+        self.assertFalse(OcrCache([broken]).get("abcd", out_txt, out_hocr))
+
+    def test_lru_eviction(self):
+        # each entry is 23 bytes, cache fits two of them
+        tier = LocalTier(os.path.join(self.tmp.name, "cache"), max_bytes=50)
+        out_txt = os.path.join(self.tmp.name, "out.txt")
+        out_hocr = os.path.join(self.tmp.name, "out.hocr")
+
+        tier.put("aa01", self.txt, self.hocr)
+        tier.put("bb02", self.txt, self.hocr)
+        # make aa01 most recently used
+        past = time.time() - 100
+        os.utime(tier.entry_dir("bb02"), (past, past))
+        self.assertTrue(tier.get("aa01", out_txt, out_hocr))
+
+        tier.put("cc03", self.txt, self.hocr)
+
+        self.assertTrue(tier.get("aa01", out_txt, out_hocr))
+        self.assertFalse(tier.get("bb02", out_txt, out_hocr))
+        self.assertTrue(tier.get("cc03", out_txt, out_hocr))
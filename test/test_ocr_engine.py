@@ -0,0 +1,74 @@
+import unittest
+from pmworker.ocr_engine import EnginePool
+
+
+class DummyEngine:
+
+    started = 0
+
+    def __init__(self, lang):
+        DummyEngine.started += 1
+        self.lang = lang
+        self.pages = 0
+        self.closed = False
+
+    def ocr(self, image_path):
+        self.pages += 1
+        return "text", "hocr"
+
+    def close(self):
+        self.closed = True
+
+
+class TestEnginePool(unittest.TestCase):
+
+    def setUp(self):
+        DummyEngine.started = 0
+
+    def test_engine_is_reused(self):
+        pool = EnginePool(size=2, max_pages=100, factory=DummyEngine)
+
+        for _ in range(5):
+            with pool.engine("deu") as engine:
+                engine.ocr("page-1.jpg")
+
+        self.assertEqual(DummyEngine.started, 1)
+        self.assertEqual(engine.pages, 5)
+
+    def test_one_engine_per_language(self):
+        pool = EnginePool(size=2, max_pages=100, factory=DummyEngine)
+
+        with pool.engine("deu") as engine_deu:
+            pass
+        with pool.engine("deu+eng") as engine_deu_eng:
+            pass
+
+        self.assertEqual(engine_deu.lang, "deu")
+        self.assertEqual(engine_deu_eng.lang, "deu+eng")
+        self.assertEqual(DummyEngine.started, 2)
+
+    def test_engine_is_recycled(self):
+        pool = EnginePool(size=1, max_pages=2, factory=DummyEngine)
+
+        engines = []
+        for _ in range(3):
+            with pool.engine("deu") as engine:
+                engine.ocr("page-1.jpg")
+                engines.append(engine)
+
+        self.assertIs(engines[0], engines[1])
+        self.assertTrue(engines[1].closed)
+        self.assertIsNot(engines[1], engines[2])
+        self.assertEqual(DummyEngine.started, 2)
+
+    def test_failed_engine_is_dropped(self):
+        pool = EnginePool(size=1, max_pages=100, factory=DummyEngine)
+
+        with self.assertRaises(ValueError):
+            with pool.engine("deu") as engine:
+                raise ValueError()
+
+        self.assertTrue(engine.closed)
+        with pool.engine("deu") as engine2:
+            pass
+        self.assertIsNot(engine, engine2)
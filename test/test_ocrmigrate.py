@@ -1,14 +1,23 @@
 import unittest
 import os
+import shutil
+import tempfile
 
 from pmworker.ocrmigrate import (
     get_pagecount,
-    get_assigns_after_delete
+    get_assigns_after_delete,
+    get_assigns_after_reorder,
+    get_assigns_after_paste,
+    migrate_pages
 )
 
 from pmworker.endpoint import (
-    Endpoint, DocumentEp
+    Endpoint, DocumentEp, PageEp
 )
+from pmworker.step import Step
+
+test_dir = os.path.dirname(__file__)
+abs_path_input_pdf = os.path.join(test_dir, "data", "input.de.pdf")
 
 
 class TestOthers(unittest.TestCase):
@@ -67,3 +76,102 @@ class TestOthers(unittest.TestCase):
             result,
             [(1, 1), (2, 4), (3, 5)]
         )
+
+    def test_get_assigns_after_reorder(self):
+        # swap first and last pages
+        result = get_assigns_after_reorder(
+            new_order=[
+                {'page_num': 4, 'page_order': 1},
+                {'page_num': 2, 'page_order': 2},
+                {'page_num': 3, 'page_order': 3},
+                {'page_num': 1, 'page_order': 4}
+            ]
+        )
+        self.assertEqual(
+            result,
+            [(1, 4), (2, 2), (3, 3), (4, 1)]
+        )
+
+    def test_get_assigns_after_paste(self):
+        result = get_assigns_after_paste(
+            page_sources=[("A", 1), ("B", 3), ("A", 2)]
+        )
+        self.assertEqual(
+            result,
+            [(1, "A", 1), (2, "B", 3), (3, "A", 2)]
+        )
+
+
+class TestMigratePages(unittest.TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.doc_ep = DocumentEp(
+            remote_endpoint=Endpoint("s3:/test-papermerge/"),
+            local_endpoint=Endpoint(f"local:{self.media}"),
+            user_id=1,
+            document_id=3,
+            file_name="x.pdf"
+        )
+        os.makedirs(os.path.dirname(self.doc_ep.url()))
+        shutil.copy(abs_path_input_pdf, self.doc_ep.url())
+
+    def tearDown(self):
+        shutil.rmtree(self.media)
+
+    def test_migrate_pages_after_reorder(self):
+        for page_num in (1, 2):
+            page_ep = PageEp(
+                document_ep=self.doc_ep,
+                page_num=page_num,
+                step=Step(1),
+                page_count=2
+            )
+            for url in (page_ep.txt_url(), page_ep.hocr_url()):
+                os.makedirs(os.path.dirname(url), exist_ok=True)
+                with open(url, "w") as f:
+                    f.write(
+                        f"<div class='ocr_page' title='image"
+                        f" \"{page_ep.img_url()}\"; bbox 0 0 10 10'>"
+                        f"page {page_num}</div>"
+                    )
+
+        new_doc_ep = DocumentEp(
+            remote_endpoint=Endpoint("s3:/test-papermerge/"),
+            local_endpoint=Endpoint(f"local:{self.media}"),
+            user_id=1,
+            document_id=3,
+            file_name="x.pdf"
+        )
+        new_doc_ep.inc_version()
+        # pages swapped
+        migrate_pages(
+            new_doc_ep,
+            [(self.doc_ep, 2), (self.doc_ep, 1)]
+        )
+
+        new_page_ep = PageEp(
+            document_ep=new_doc_ep,
+            page_num=1,
+            step=Step(1),
+            page_count=2
+        )
+        with open(new_page_ep.txt_url()) as f:
+            self.assertIn("page 2", f.read())
+        # hocr points to the image of the new version
+        with open(new_page_ep.hocr_url()) as f:
+            hocr = f.read()
+        self.assertIn("page 2", hocr)
+        self.assertIn(f'image "{new_page_ep.img_url()}"', hocr)
+
+        # artifacts are copies, rewriting them keeps the old version
+        with open(new_page_ep.txt_url(), "w") as f:
+            f.write("OCRed again")
+        old_page_ep = PageEp(
+            document_ep=self.doc_ep,
+            page_num=2,
+            step=Step(1),
+            page_count=2
+        )
+        with open(old_page_ep.txt_url()) as f:
+            self.assertIn("page 2", f.read())
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker import pdfengine
+
+if pdfengine.is_available():
+    import pikepdf
+
+
+def make_pdf(path, page_count, tag):
+    pdf = pikepdf.new()
+    for idx in range(page_count):
+        pdf.add_blank_page()
+        pdf.pages[-1].obj.PMTag = pikepdf.String(f"{tag}{idx + 1}")
+    pdf.save(path)
+
+
+def page_tags(path):
+    with pikepdf.open(path) as pdf:
+        return [str(page.obj.PMTag) for page in pdf.pages]
+
+
+@unittest.skipUnless(pdfengine.is_available(), "pikepdf is not installed")
+class TestPdfEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.doc_a = os.path.join(self.tmp.name, "a.pdf")
+        self.doc_b = os.path.join(self.tmp.name, "b.pdf")
+        make_pdf(self.doc_a, 4, "A")
+        make_pdf(self.doc_b, 3, "B")
+        self.output = os.path.join(self.tmp.name, "v1", "a.pdf")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reorder(self):
+        pdfengine.cat(
+            {'A': self.doc_a},
+            [('A', 4), ('A', 2), ('A', 3), ('A', 1)],
+            self.output
+        )
+        self.assertEqual(page_tags(self.output), ['A4', 'A2', 'A3', 'A1'])
+        # source is not modified
+        self.assertEqual(page_tags(self.doc_a), ['A1', 'A2', 'A3', 'A4'])
+
+    def test_delete(self):
+        pdfengine.cat(
+            {'A': self.doc_a},
+            [('A', 1), ('A', 3)],
+            self.output
+        )
+        self.assertEqual(page_tags(self.output), ['A1', 'A3'])
+
+    def test_insert(self):
+        pdfengine.cat(
+            {'A': self.doc_a, 'B': self.doc_b},
+            [('A', 1), ('B', 3), ('B', 1), ('A', 2)],
+            self.output
+        )
+        self.assertEqual(page_tags(self.output), ['A1', 'B3', 'B1', 'A2'])
+
+
+class TestUsePikepdf(unittest.TestCase):
+
+    @mock.patch.object(pdfengine, '_warned', False)
+    @mock.patch.object(pdfengine, 'pikepdf', None)
+    @mock.patch.object(pdfengine, 'get_settings')
+    def test_missing_pikepdf_warns_once(self, get_settings):
+        get_settings.return_value = mock.Mock(pdf_engine=pdfengine.PIKEPDF)
+
+        with mock.patch.object(pdfengine.logger, 'warning') as warning:
+            self.assertFalse(pdfengine.use_pikepdf())
+            self.assertFalse(pdfengine.use_pikepdf())
+
+        warning.assert_called_once()
@@ -1,6 +1,6 @@
 import unittest
 from pathlib import Path
-from pmworker.pdfinfo import get_pagecount
+from pmworker.pdfinfo import get_pagecount, read_pagecount
 
 
 test_dir = Path(__file__).parent
@@ -18,3 +18,12 @@ class TestPDFInfo(unittest.TestCase):
             2,
             f"Document actually has 2 pages, not {page_count}"
         )
+
+    def test_read_pagecount(self):
+        """
+        Page count is read with pikepdf, without pdfinfo
+        """
+        self.assertEqual(
+            read_pagecount(abs_path_input_pdf),
+            2
+        )
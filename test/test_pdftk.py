@@ -1,6 +1,14 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 from pathlib import Path
 from pmworker.pdftk import (
+    cat,
+    get_handle,
+    paste_pages,
+    page_ranges,
+    page_spec,
     cat_ranges_for_delete,
     cat_ranges_for_reorder,
     split_ranges
@@ -194,3 +202,166 @@ class TestPDFTk(unittest.TestCase):
             [2, 3, 4, 5, 6, 7],
         )
 
+
+def touch_output(cmd):
+    with open(cmd[-1], "w"):
+        pass
+
+
+@mock.patch('pmworker.pdftk.make_sure_path_exists')
+@mock.patch('pmworker.pdftk.get_pagecount', return_value=10)
+@mock.patch('pmworker.pdftk.run')
+@mock.patch('pmworker.pdfengine.use_pikepdf', return_value=False)
+class TestCat(unittest.TestCase):
+
+    def test_pdftk_command(self, use_pikepdf, run, *args):
+        cat(
+            {'A': '/docs/a.pdf', 'B': '/docs/b.pdf'},
+            [('A', 1), ('B', 3), ('A', 2)],
+            '/docs/v1/a.pdf'
+        )
+        run.assert_called_once_with([
+            "pdftk",
+            "A=/docs/a.pdf",
+            "B=/docs/b.pdf",
+            "cat",
+            "A1",
+            "B3",
+            "A2",
+            "output",
+            "/docs/v1/a.pdf"
+        ])
+
+    def test_pdftk_command_ranges(self, use_pikepdf, run, *args):
+        cat(
+            {'A': '/docs/a.pdf', 'B': '/docs/b.pdf'},
+            [('A', p) for p in range(1, 5)] +
+            [('B', 3), ('B', 4)] +
+            [('A', p) for p in range(5, 11)],
+            '/docs/v1/a.pdf'
+        )
+        run.assert_called_once_with([
+            "pdftk",
+            "A=/docs/a.pdf",
+            "B=/docs/b.pdf",
+            "cat",
+            "A1-4",
+            "B3-4",
+            "A5-end",
+            "output",
+            "/docs/v1/a.pdf"
+        ])
+
+    @mock.patch('pmworker.pdftk.get_max_cmd_length', return_value=200)
+    def test_command_too_long(self, max_length, use_pikepdf, run, *args):
+        run.side_effect = touch_output
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "a.pdf")
+            cat(
+                {'A': '/docs/a.pdf'},
+                [('A', p) for p in range(100, 0, -1)],
+                output
+            )
+
+        cmds = [call[0][0] for call in run.call_args_list]
+        for cmd in cmds:
+            self.assertLessEqual(len(" ".join(cmd)), 200)
+        # 100 page specs split into several pdftk runs, plus
+        # concatenation of parts
+        self.assertGreater(len(cmds), 2)
+        specs = [
+            arg for cmd in cmds if cmd[1] == "A=/docs/a.pdf"
+            for arg in cmd[cmd.index("cat") + 1:cmd.index("output")]
+        ]
+        self.assertEqual(specs, [f"A{p}" for p in range(100, 0, -1)])
+        self.assertEqual(cmds[-1][-2:], ["output", output])
+
+    @mock.patch('pmworker.pdftk.get_max_cmd_length', return_value=300)
+    def test_many_sources(self, max_length, use_pikepdf, run, *args):
+        run.side_effect = touch_output
+        sources = {
+            get_handle(idx): f"/docs/source-{idx}.pdf" for idx in range(200)
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "a.pdf")
+            cat(sources, [(handle, 1) for handle in sources], output)
+
+        cmds = [call[0][0] for call in run.call_args_list]
+        for cmd in cmds:
+            self.assertLessEqual(len(" ".join(cmd)), 300)
+            # only sources used by the part are passed to pdftk
+            handles = [arg.split("=")[0] for arg in cmd if "=" in arg]
+            self.assertEqual(
+                handles,
+                [
+                    arg.rstrip("0123456789")
+                    for arg in cmd[cmd.index("cat") + 1:-2]
+                ]
+            )
+        part_specs = [
+            arg for cmd in cmds if "/docs/" in cmd[1]
+            for arg in cmd[cmd.index("cat") + 1:-2]
+        ]
+        self.assertEqual(part_specs, [f"{handle}1" for handle in sources])
+        self.assertEqual(cmds[-1][-1], output)
+
+    @mock.patch('pmworker.pdftk.get_max_cmd_length', return_value=60)
+    def test_source_path_too_long(self, max_length, use_pikepdf, run, *args):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                cat(
+                    {'A': '/docs/' + 'a' * 100 + '.pdf'},
+                    [('A', 2), ('A', 1)],
+                    os.path.join(tmp, "a.pdf")
+                )
+
+
+class TestPageRanges(unittest.TestCase):
+
+    def test_page_ranges(self):
+        self.assertEqual(
+            page_ranges(
+                [('A', 1), ('A', 2), ('A', 3), ('B', 7), ('A', 5), ('A', 4)]
+            ),
+            [('A', 1, 3), ('B', 7, 7), ('A', 5, 5), ('A', 4, 4)]
+        )
+        self.assertEqual(page_ranges([]), [])
+
+    def test_page_spec(self):
+        self.assertEqual(page_spec('A', 3, 3, 10), "A3")
+        self.assertEqual(page_spec('A', 1, 500, 1000), "A1-500")
+        self.assertEqual(page_spec('A', 501, 1000, 1000), "A501-end")
+
+
+class TestHandles(unittest.TestCase):
+
+    def test_get_handle(self):
+        self.assertEqual(get_handle(0), "A")
+        self.assertEqual(get_handle(25), "Z")
+        self.assertEqual(get_handle(26), "AA")
+        self.assertEqual(get_handle(27), "AB")
+        self.assertEqual(get_handle(701), "ZZ")
+        self.assertEqual(get_handle(702), "AAA")
+        handles = [get_handle(idx) for idx in range(1000)]
+        self.assertEqual(len(set(handles)), 1000)
+
+    @mock.patch('pmworker.pdftk.cat')
+    def test_paste_from_many_documents(self, cat):
+        src_doc_ep_list = []
+        for idx in range(200):
+            doc_ep = mock.Mock()
+            doc_ep.url.return_value = f"/docs/doc_{idx}.pdf"
+            src_doc_ep_list.append({'doc_ep': doc_ep, 'page_nums': [1]})
+
+        paste_pages(
+            mock.Mock(),
+            src_doc_ep_list,
+            migrate_ocr=False
+        )
+
+        # written once
+        cat.assert_called_once()
+        sources, pages, output = cat.call_args[0]
+        self.assertEqual(len(sources), 200)
+        self.assertEqual(sources["AD"], "/docs/doc_29.pdf")
+        self.assertEqual(pages[29], ("AD", 1))
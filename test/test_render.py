@@ -0,0 +1,79 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from pmworker.step import Steps
+from pmworker.render import (
+    build_img_pyramid,
+    largest_step,
+    render_batches
+)
+
+
+class PageUrl:
+    """
+    Minimal stand in for pmworker.endpoint.PageEp - only image
+    urls are needed.
+    """
+
+    def __init__(self, root, step):
+        self.root = root
+        self.step = step
+
+    def img_url(self):
+        return os.path.join(
+            self.root, str(self.step.percent), "page-1.jpg"
+        )
+
+
+class TestRender(unittest.TestCase):
+
+    def test_largest_step(self):
+        self.assertEqual(
+            largest_step().percent,
+            125
+        )
+
+    def test_build_img_pyramid(self):
+        with tempfile.TemporaryDirectory() as root:
+            page_url = PageUrl(root, largest_step())
+            os.makedirs(os.path.dirname(page_url.img_url()))
+            Image.new(
+                'RGB', (largest_step().width, 2192), 'white'
+            ).save(page_url.img_url())
+
+            build_img_pyramid(page_url)
+
+            for step in Steps():
+                with Image.open(PageUrl(root, step).img_url()) as image:
+                    self.assertEqual(image.width, step.width)
+                    self.assertEqual(
+                        image.height,
+                        round(2192 * step.width / largest_step().width)
+                    )
+
+    def test_render_batches(self):
+        rendered = []
+        second_batch = threading.Event()
+
+        def render_pages(page_urls):
+            rendered.append(page_urls)
+            if len(rendered) == 2:
+                second_batch.set()
+            return page_urls
+
+        with mock.patch(
+            'pmworker.render.render_pages', side_effect=render_pages
+        ):
+            batches = render_batches(list(range(1, 8)), 3)
+            self.assertEqual(next(batches), [1, 2, 3])
+            # next batch renders while the first one is processed
+            self.assertTrue(second_batch.wait(5))
+            self.assertEqual(list(batches), [[4, 5, 6], [7]])
+
+        self.assertEqual(rendered, [[1, 2, 3], [4, 5, 6], [7]])
+        self.assertEqual(list(render_batches([], 3)), [])
@@ -0,0 +1,54 @@
+import unittest
+
+from kombu import Queue
+
+from pmworker.routing import (
+    get_task_queues,
+    route_task,
+    INTERACTIVE,
+    BULK,
+    MAINTENANCE,
+    MAX_PRIORITY,
+    QUEUE_PRIORITIES
+)
+
+
+class TestRouting(unittest.TestCase):
+
+    def test_task_queues(self):
+        queues = get_task_queues('papermerge')
+
+        self.assertEqual(
+            [queue.name for queue in queues],
+            [INTERACTIVE, BULK, MAINTENANCE]
+        )
+        for queue in queues:
+            self.assertEqual(queue.exchange.name, 'papermerge')
+            self.assertEqual(queue.routing_key, queue.name)
+            self.assertEqual(
+                queue.queue_arguments['x-max-priority'], MAX_PRIORITY
+            )
+
+    def test_route_task(self):
+        self.assertEqual(
+            route_task('pmworker.tasks.ocr_page', (), {}, {}),
+            {'queue': INTERACTIVE, 'priority': MAX_PRIORITY}
+        )
+        self.assertEqual(
+            route_task('pmworker.tasks.ocr_document_split', (), {}, {}),
+            {'queue': BULK, 'priority': QUEUE_PRIORITIES[BULK]}
+        )
+        self.assertEqual(
+            route_task('pmworker.tasks.gc_document_versions', (), {}, {}),
+            {'queue': MAINTENANCE, 'priority': 0}
+        )
+        self.assertIsNone(route_task('other.task', (), {}, {}))
+
+    def test_explicit_queue_sets_its_priority(self):
+        route = route_task(
+            'pmworker.tasks.ocr_document', (), {}, {'queue': Queue(BULK)}
+        )
+
+        self.assertEqual(
+            route, {'queue': BULK, 'priority': QUEUE_PRIORITIES[BULK]}
+        )
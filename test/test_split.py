@@ -0,0 +1,166 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker import tasks
+from pmworker.split import (
+    get_chunks,
+    estimate_page_cost,
+    summarize,
+    failed_summary,
+    write_summary,
+    SUMMARY_NAME
+)
+
+
+class TestSplit(unittest.TestCase):
+
+    def test_chunks_cover_all_pages_evenly(self):
+        # 300 seconds per chunk / 3 seconds per page
+        self.assertEqual(len(get_chunks(2000, page_cost=3)), 20)
+
+        chunks = get_chunks(2000, page_cost=30)
+
+        self.assertEqual(chunks[0], (1, 32))
+        self.assertEqual(chunks[-1][1], 2000)
+        self.assertEqual(len(chunks), 64)
+        sizes = [last - first + 1 for first, last in chunks]
+        self.assertEqual(sum(sizes), 2000)
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+        for (_, last), (first, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(last + 1, first)
+
+    def test_small_document_is_one_chunk(self):
+        self.assertEqual(get_chunks(7, page_cost=3), [(1, 7)])
+        self.assertEqual(get_chunks(0, page_cost=3), [])
+
+    def test_min_chunk_pages(self):
+        # expensive pages, but no chunk smaller than min_pages
+        chunks = get_chunks(100, page_cost=600, min_pages=10)
+
+        self.assertEqual(len(chunks), 10)
+
+    def test_scanned_pages_cost_more(self):
+        scanned = estimate_page_cost(10, 10 * 1024 * 1024, 3)
+        text = estimate_page_cost(10, 100 * 1024, 3)
+
+        self.assertGreater(scanned, text)
+        self.assertEqual(text, 1.5)
+
+    def test_summarize(self):
+        chunk_results = [
+            [
+                {'page_num': 2, 'blank': True, 'ocr_time': 0.5},
+                {'page_num': 1, 'blank': False, 'ocr_time': 2.0},
+            ],
+            [
+                {
+                    'page_num': 3,
+                    'blank': False,
+                    'ocr_time': None,
+                    'error': 'boom'
+                },
+            ]
+        ]
+        summary = summarize(
+            chunk_results, page_count=3, started_at=10, finished_at=15
+        )
+
+        self.assertEqual(summary['pages_processed'], 3)
+        self.assertEqual(summary['chunks'], 2)
+        self.assertEqual(summary['blank_pages'], [2])
+        self.assertEqual(
+            summary['failed_pages'], [{'page_num': 3, 'error': 'boom'}]
+        )
+        self.assertEqual(summary['ocr_time'], 2.5)
+        self.assertEqual(summary['max_page_ocr_time'], 2.0)
+        self.assertEqual(summary['total_time'], 5)
+
+    def test_failed_summary(self):
+        summary = failed_summary(
+            "worker lost", page_count=3, started_at=10, finished_at=12
+        )
+
+        self.assertEqual(summary['error'], "worker lost")
+        self.assertEqual(summary['pages_processed'], 0)
+        self.assertEqual(
+            summary['failed_pages'],
+            [
+                {'page_num': page_num, 'error': "worker lost"}
+                for page_num in (1, 2, 3)
+            ]
+        )
+        self.assertEqual(summary['total_time'], 2)
+
+    def test_write_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            local = os.path.join(tmp, "pages")
+            remote = "local:" + os.path.join(tmp, "remote")
+            write_summary(local, {'page_count': 3}, remote)
+
+            with open(os.path.join(local, SUMMARY_NAME)) as f:
+                self.assertEqual(json.load(f), {'page_count': 3})
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp, "remote", SUMMARY_NAME))
+            )
+
+
+class TestFailingChunk(unittest.TestCase):
+
+    def setUp(self):
+        for name in ('pinned_document', 'save_summary'):
+            patcher = mock.patch.object(tasks, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            tasks, 'fetch_document', side_effect=IOError("S3 error")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_chunk_failure_is_reported_per_page(self):
+        results = tasks.ocr_document.run(
+            1, 2, "x.pdf", "deu", first_page=11, last_page=20,
+            fail_fast=False
+        )
+
+        self.assertEqual(
+            [result['page_num'] for result in results],
+            list(range(11, 21))
+        )
+        for result in results:
+            self.assertEqual(result['error'], "S3 error")
+
+        with self.assertRaises(IOError):
+            tasks.ocr_document.run(
+                1, 2, "x.pdf", "deu", first_page=11, last_page=20
+            )
+
+    def test_summary_of_failed_chunk(self):
+        results = tasks.ocr_document.run(
+            1, 2, "x.pdf", "deu", first_page=1, last_page=2,
+            fail_fast=False
+        )
+        summary = tasks.ocr_document_summary.run(
+            [results, [{'page_num': 3, 'blank': True, 'ocr_time': 1.0}]],
+            1, 2, "x.pdf", page_count=3, started_at=0
+        )
+
+        self.assertEqual(
+            [page['page_num'] for page in summary['failed_pages']],
+            [1, 2]
+        )
+        self.assertEqual(summary['blank_pages'], [3])
+        tasks.save_summary.assert_called_once()
+
+    def test_errback_writes_summary(self):
+        summary = tasks.ocr_document_split_failed.run(
+            mock.Mock(), Exception("worker lost"), None,
+            1, 2, "x.pdf", page_count=3, started_at=0
+        )
+
+        self.assertEqual(summary['error'], "worker lost")
+        self.assertEqual(len(summary['failed_pages']), 3)
+        tasks.save_summary.assert_called_once()
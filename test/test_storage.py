@@ -0,0 +1,274 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import botocore.exceptions
+
+from pmworker.storage import (
+    get_s3_client,
+    download_url,
+    urls_exist,
+    Storage,
+    S3Backend,
+    LocalBackend,
+    MemoryBackend,
+    get_backend,
+    _get_ranges
+)
+from pmworker.exceptions import DeleteError
+
+
+class TestS3Client(unittest.TestCase):
+
+    def setUp(self):
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-central-1')
+
+    def test_client_is_shared(self):
+        self.assertIs(
+            get_s3_client(),
+            get_s3_client()
+        )
+
+    def test_new_client_after_fork(self):
+        client = get_s3_client()
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            forked_client = get_s3_client()
+
+        self.assertIsNot(client, forked_client)
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch(
+            'pmworker.storage.get_s3_client',
+            return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_object_single_request(self):
+        self.client.get_object.side_effect = botocore.exceptions.ClientError(
+            {'Error': {'Code': 'NoSuchKey'}}, 'GetObject'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertFalse(
+                download_url(
+                    "s3:/bucket/docs/x.pdf",
+                    os.path.join(tmp, "x.pdf")
+                )
+            )
+
+        self.client.head_object.assert_not_called()
+        self.assertEqual(self.client.get_object.call_count, 1)
+
+    def test_download(self):
+        body = mock.Mock()
+        body.iter_chunks.return_value = [b'%PDF-', b'1.4']
+        self.client.get_object.return_value = {
+            'Body': body,
+            'ETag': '"abc"'
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            local = os.path.join(tmp, "docs", "x.pdf")
+            self.assertTrue(
+                download_url("s3:/bucket/docs/x.pdf", local)
+            )
+            with open(local, 'rb') as f:
+                self.assertEqual(f.read(), b'%PDF-1.4')
+
+        self.client.head_object.assert_not_called()
+
+    def test_ranges(self):
+        # whole object was received with the first request
+        self.assertEqual(_get_ranges(100, 100, 1000), [])
+        # below threshold, rest in one request
+        self.assertEqual(_get_ranges(500, 100, 1000), [(100, 499)])
+        self.assertEqual(
+            _get_ranges(350, 100, 200),
+            [(100, 199), (200, 299), (300, 349)]
+        )
+
+    def test_urls_exist(self):
+        paginator = self.client.get_paginator.return_value
+        paginator.paginate.return_value = [{
+            'Contents': [
+                {'Key': 'results/pages/page_1.txt'},
+                {'Key': 'results/pages/page_1/100/page-1.jpg'},
+            ]
+        }]
+        urls = [
+            "s3:/bucket/results/pages/page_1.txt",
+            "s3:/bucket/results/pages/page_1/100/page-1.jpg",
+            "s3:/bucket/results/pages/page_1/10/page-1.jpg",
+        ]
+
+        self.assertEqual(
+            urls_exist(urls),
+            {
+                urls[0]: True,
+                urls[1]: True,
+                urls[2]: False
+            }
+        )
+        # sibling pages (page_10, page_100, ...) are not listed
+        paginator.paginate.assert_called_once_with(
+            Bucket='bucket',
+            Prefix='results/pages/page_1/'
+        )
+        # txt file is checked separately
+        self.client.head_object.assert_called_once_with(
+            Bucket='bucket',
+            Key='results/pages/page_1.txt'
+        )
+
+    def test_delete_errors(self):
+        self.client.delete_objects.return_value = {
+            'Errors': [{
+                'Key': 'results/page_2.txt',
+                'Code': 'AccessDenied',
+                'Message': 'Access Denied'
+            }]
+        }
+
+        with self.assertRaises(DeleteError) as cm:
+            S3Backend().delete([
+                "s3:/bucket/results/page_1.txt",
+                "s3:/bucket/results/page_2.txt"
+            ])
+        self.assertEqual(
+            cm.exception.errors,
+            [("s3:/bucket/results/page_2.txt", 'AccessDenied')]
+        )
+
+
+class TestStorageInMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        patcher = mock.patch(
+            'pmworker.storage.get_s3_client',
+            return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage = Storage(
+            mock.Mock(bucketname='bucket', key='results/page_1.txt')
+        )
+
+    def test_upload(self):
+        with mock.patch('tempfile.NamedTemporaryFile') as tmp:
+            self.storage.upload('results/page_1.txt', 'Grüß Gott')
+
+        tmp.assert_not_called()
+        fileobj, bucketname, keyname = self.client.upload_fileobj.call_args[0]
+        self.assertEqual(fileobj.read(), 'Grüß Gott'.encode('utf-8'))
+        self.assertEqual(bucketname, 'bucket')
+        self.assertEqual(keyname, 'results/page_1.txt')
+
+    def test_get_text_content(self):
+        data = 'Grüß Gott'.encode('utf-8')
+        body = mock.Mock()
+        # multibyte character split between chunks
+        body.iter_chunks.return_value = [data[:3], data[3:]]
+        self.client.get_object.return_value = {'Body': body}
+
+        with mock.patch('tempfile.NamedTemporaryFile') as tmp:
+            self.assertEqual(
+                self.storage.get_text_content(),
+                'Grüß Gott'
+            )
+
+        tmp.assert_not_called()
+        self.client.get_object.assert_called_once_with(
+            Bucket='bucket',
+            Key='results/page_1.txt'
+        )
+
+
+class BackendMixin:
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.local_path = os.path.join(self.tmp.name, "local", "x.txt")
+        os.makedirs(os.path.dirname(self.local_path))
+        with open(self.local_path, 'w') as f:
+            f.write("Hallo")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_put_get(self):
+        url = self.url("docs/user_1/x.txt")
+        copy_path = os.path.join(self.tmp.name, "copy", "x.txt")
+
+        self.assertIsNone(self.backend.get(url, copy_path))
+        self.assertFalse(self.backend.exists(url))
+
+        self.backend.put(self.local_path, url)
+        etag = self.backend.get(url, copy_path)
+        self.assertTrue(etag)
+        self.assertTrue(self.backend.exists(url))
+        self.assertEqual(self.read(copy_path), "Hallo")
+
+        # same etag - local copy is up to date, nothing is copied
+        os.remove(copy_path)
+        self.assertEqual(self.backend.get(url, copy_path, etag=etag), etag)
+        self.assertFalse(os.path.exists(copy_path))
+
+    def test_list_copy_delete(self):
+        url_1 = self.url("results/page_1.txt")
+        url_2 = self.url("results/page_2.txt")
+        self.backend.put(self.local_path, url_1)
+
+        self.assertTrue(self.backend.copy(url_1, url_2))
+        self.assertFalse(
+            self.backend.copy(self.url("results/page_3.txt"), url_2)
+        )
+        self.assertEqual(
+            sorted(self.backend.list(self.url("results/page_"))),
+            [url_1, url_2]
+        )
+        self.assertEqual(
+            self.backend.exists_many([url_1, self.url("results/x")]),
+            {url_1: True, self.url("results/x"): False}
+        )
+
+        self.backend.delete([url_1, url_2])
+        self.assertEqual(list(self.backend.list(self.url("results/"))), [])
+
+
+class TestLocalBackend(BackendMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend = LocalBackend()
+
+    def url(self, key):
+        return f"local:{self.tmp.name}/remote/{key}"
+
+
+class TestMemoryBackend(BackendMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend = MemoryBackend()
+
+    def url(self, key):
+        return f"memory:/bucket/{key}"
+
+
+class TestGetBackend(unittest.TestCase):
+
+    def test_scheme(self):
+        self.assertIsInstance(get_backend("s3:/bucket/x"), S3Backend)
+        self.assertIsInstance(get_backend("local:/var/x"), LocalBackend)
+        self.assertIs(get_backend("memory:/x"), get_backend("memory:/y"))
+        with self.assertRaises(ValueError):
+            get_backend("ftp:/x")
@@ -4,7 +4,7 @@ import unittest
 import logging
 from pmworker import get_settings
 from pmworker.endpoint import Endpoint
-from pmworker.tasks import ocr_page
+from pmworker.tasks import ocr_page, ocr_document
 
 logger = logging.getLogger(__name__)
 
@@ -70,3 +70,53 @@ class TestTask(unittest.TestCase):
             os.path.exists(page_1_100_hocr),
             f"File {page_1_100_hocr} does not exists."
         )
+
+    def test_ocr_page_out_of_range(self):
+        with self.assertRaises(ValueError):
+            ocr_page(
+                user_id=1,
+                document_id=1,
+                file_name="input.de.pdf",
+                page_num=3,
+                lang="deu",
+                s3_upload=False,
+                s3_download=False,
+                test_local_alternative=abs_path_input_pdf
+            )
+
+    def test_ocr_document(self):
+
+        settings = get_settings()
+        results = ocr_document(
+            user_id=1,
+            document_id=2,
+            file_name="input.de.pdf",
+            lang="deu",
+            s3_upload=False,
+            s3_download=False,
+            test_local_alternative=abs_path_input_pdf
+        )
+        self.assertEqual(
+            [result['page_num'] for result in results],
+            [1, 2]
+        )
+        pages = os.path.join(
+            Endpoint(settings.local_storage).dirname,
+            "results",
+            "user_1",
+            "document_2",
+            "pages",
+        )
+        for page_num in (1, 2):
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(pages, f"page_{page_num}.txt")
+                )
+            )
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(
+                        pages, f"page_{page_num}", "125", "page-1.hocr"
+                    )
+                )
+            )
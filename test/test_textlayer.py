@@ -0,0 +1,61 @@
+import unittest
+from pmworker.textlayer import TextLayer
+
+BBOX_LAYOUT = """<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<title></title>
+</head>
+<body>
+<doc>
+  <page width="620.000000" height="877.000000">
+    <flow>
+      <block xMin="50.000000" yMin="60.000000" xMax="200.000000" yMax="80.000000">
+        <line xMin="50.000000" yMin="60.000000" xMax="200.000000" yMax="80.000000">
+          <word xMin="50.000000" yMin="60.000000" xMax="100.000000" yMax="80.000000">Hello</word>
+          <word xMin="110.000000" yMin="60.000000" xMax="200.000000" yMax="80.000000">&lt;World&gt;</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+</doc>
+</body>
+</html>
+"""
+
+
+class TestTextLayer(unittest.TestCase):
+
+    def test_text(self):
+        text_layer = TextLayer(BBOX_LAYOUT)
+
+        self.assertEqual(text_layer.text, "Hello <World>\n")
+
+    def test_stats(self):
+        text_layer = TextLayer(BBOX_LAYOUT)
+
+        self.assertEqual(text_layer.stats(), (12, 1.0))
+        self.assertTrue(text_layer.is_usable(10, 0.9))
+        self.assertFalse(text_layer.is_usable(100, 0.9))
+
+    def test_unmapped_glyphs(self):
+        text_layer = TextLayer(
+            BBOX_LAYOUT.replace("Hello", "���")
+        )
+        count, ratio = text_layer.stats()
+
+        self.assertEqual(count, 12)
+        self.assertFalse(text_layer.is_usable(10, 0.9))
+
+    def test_to_hocr(self):
+        text_layer = TextLayer(BBOX_LAYOUT)
+        # page is 620pt wide, rendered as 1240px
+        hocr = text_layer.to_hocr(width=1240, lang="deu")
+
+        self.assertIn("title='bbox 0 0 1240 1754; ppageno 0'", hocr)
+        self.assertIn(
+            "title='bbox 100 120 200 160; x_wconf 100'>Hello</span>",
+            hocr
+        )
+        self.assertIn(">&lt;World&gt;</span>", hocr)
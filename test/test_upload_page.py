@@ -0,0 +1,96 @@
+import threading
+import unittest
+from unittest import mock
+
+from pmworker import tasks
+from pmworker.exceptions import UploadError
+from pmworker.step import Step
+
+
+class PageEp:
+
+    def __init__(self):
+        self.step = Step(1)
+
+    def txt_url(self):
+        return "pages/page_1.txt"
+
+    def hocr_url(self):
+        return f"pages/page_1/{self.step.percent}/page-1.hocr"
+
+    def img_url(self):
+        return f"pages/page_1/{self.step.percent}/page-1.jpg"
+
+
+class TestUploadPage(unittest.TestCase):
+
+    def setUp(self):
+        self.uploaded = []
+        self.lock = threading.Lock()
+        self.failing = set()
+        self.settings = mock.Mock(upload_step_percents=[100, 10])
+        for name in ('upload_txt', 'upload_hocr', 'upload_img'):
+            url_method = name.replace('upload_', '') + '_url'
+            patcher = mock.patch.object(
+                tasks, name, side_effect=self.upload(url_method)
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, value in (
+            ('get_settings', self.settings),
+            ('get_s3_pool_size', 4)
+        ):
+            patcher = mock.patch.object(tasks, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self, url_method):
+        def _upload(page_url):
+            path = getattr(page_url, url_method)()
+            if path in self.failing:
+                raise IOError(f"cannot upload {path}")
+            with self.lock:
+                self.uploaded.append(path)
+        return _upload
+
+    def test_selected_steps(self):
+        tasks.upload_page(PageEp())
+
+        self.assertEqual(
+            sorted(self.uploaded),
+            [
+                "pages/page_1.txt",
+                "pages/page_1/10/page-1.jpg",
+                "pages/page_1/100/page-1.hocr",
+                "pages/page_1/100/page-1.jpg",
+            ]
+        )
+
+    def test_default_steps_skip_thumbnails(self):
+        self.settings.upload_step_percents = None
+        tasks.upload_page(PageEp())
+
+        self.assertEqual(len(self.uploaded), 9)
+        self.assertNotIn("pages/page_1/10/page-1.jpg", self.uploaded)
+
+    def test_failed_uploads(self):
+        self.failing = {
+            "pages/page_1.txt",
+            "pages/page_1/100/page-1.hocr"
+        }
+
+        with self.assertRaises(UploadError) as cm:
+            tasks.upload_page(PageEp())
+
+        # remaining uploads complete
+        self.assertEqual(
+            sorted(self.uploaded),
+            [
+                "pages/page_1/10/page-1.jpg",
+                "pages/page_1/100/page-1.jpg",
+            ]
+        )
+        self.assertEqual(
+            sorted(path for path, _ in cm.exception.errors),
+            sorted(self.failing)
+        )
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pmworker.storage import LocalBackend
+from pmworker.version_gc import (
+    version_of,
+    get_stale_versions,
+    collect_document_versions
+)
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write("x")
+
+
+class TestVersionGc(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = os.path.join(self.tmp.name, "media")
+        self.remote = os.path.join(self.tmp.name, "remote")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_version_of(self):
+        self.assertEqual(version_of("x.pdf"), 0)
+        self.assertEqual(version_of("pages/page_1.txt"), 0)
+        self.assertEqual(version_of("v3/pages/page_1.txt"), 3)
+        self.assertEqual(version_of("v12/x.pdf"), 12)
+        # file, not version directory
+        self.assertEqual(version_of("v3"), 0)
+
+    def test_stale_versions(self):
+        self.assertEqual(get_stale_versions({0, 1, 2, 3}, 2), [0, 1])
+        self.assertEqual(get_stale_versions({0}, 2), [])
+        with self.assertRaises(ValueError):
+            get_stale_versions({0, 1}, 0)
+
+    def prefixes(self, user_id, document_id, file_name):
+        return [
+            (
+                f"local:{self.remote}/{aux_dir}/user_1/document_3/",
+                f"{self.media}/{aux_dir}/user_1/document_3/"
+            )
+            for aux_dir in ('docs', 'results')
+        ]
+
+    def test_collect_document_versions(self):
+        for root in (self.media, self.remote):
+            doc_dir = os.path.join(root, "docs", "user_1", "document_3")
+            results_dir = os.path.join(
+                root, "results", "user_1", "document_3"
+            )
+            touch(os.path.join(doc_dir, "x.pdf"))
+            touch(os.path.join(results_dir, "pages", "page_1.txt"))
+            for version in (1, 2, 3):
+                touch(os.path.join(doc_dir, f"v{version}", "x.pdf"))
+                touch(os.path.join(
+                    results_dir, f"v{version}", "pages", "page_1.txt"
+                ))
+
+        with mock.patch(
+            'pmworker.version_gc.get_document_prefixes',
+            self.prefixes
+        ), mock.patch(
+            'pmworker.version_gc.get_backend',
+            return_value=LocalBackend()
+        ), mock.patch(
+            'pmworker.version_gc.get_local_cache'
+        ) as get_local_cache:
+            get_local_cache.return_value.pinned_paths.return_value = set()
+            result = collect_document_versions(1, 3, "x.pdf", keep=2)
+
+        self.assertEqual(result['removed_versions'], [0, 1])
+        self.assertEqual(result['remote_objects'], 4)
+        # x.pdf, v1/, pages/, v1/
+        self.assertEqual(result['local_paths'], 4)
+        for root in (self.media, self.remote):
+            doc_dir = os.path.join(root, "docs", "user_1", "document_3")
+            results_dir = os.path.join(
+                root, "results", "user_1", "document_3"
+            )
+            self.assertFalse(os.path.exists(os.path.join(doc_dir, "x.pdf")))
+            self.assertFalse(
+                os.path.exists(os.path.join(doc_dir, "v1", "x.pdf"))
+            )
+            self.assertTrue(
+                os.path.exists(os.path.join(doc_dir, "v2", "x.pdf"))
+            )
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(results_dir, "v3", "pages", "page_1.txt")
+                )
+            )
+            self.assertFalse(
+                os.path.exists(
+                    os.path.join(results_dir, "pages", "page_1.txt")
+                )
+            )